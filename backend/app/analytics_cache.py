@@ -0,0 +1,53 @@
+import orjson
+from redis import Redis
+
+from .redis_client import get_redis
+
+
+class AnalyticsCache:
+    # Short-lived cache of analytics responses. Every entry for one user lives in
+    # a single hash, so any write to that user's transactions drops them with one DEL.
+    def __init__(self, redis_url: str, key_prefix: str = "analytics", ttl_seconds: int = 60) -> None:
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self.ttl_seconds = ttl_seconds
+        self._client: Redis | None = None
+
+    @property
+    def client(self) -> Redis:
+        if self._client is None:
+            self._client = get_redis(self.redis_url)
+        return self._client
+
+    def _key(self, user_id: str | None) -> str:
+        # User ids are case-sensitive, so they are not normalized here.
+        return f"{self.key_prefix}:{user_id or ''}"
+
+    def get(self, user_id: str | None, entry: str) -> list | None:
+        if self.ttl_seconds <= 0:
+            return None
+        try:
+            raw = self.client.hget(self._key(user_id), entry)
+        except Exception:  # noqa: BLE001
+            return None
+        return None if raw is None else orjson.loads(raw)
+
+    def set(self, user_id: str | None, entry: str, value: list) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        key = self._key(user_id)
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.hset(key, entry, orjson.dumps(value))
+            pipeline.expire(key, self.ttl_seconds)
+            pipeline.execute()
+        except Exception:  # noqa: BLE001
+            return
+
+    def invalidate(self, user_id: str | None) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        try:
+            self.client.delete(self._key(user_id))
+        except Exception:  # noqa: BLE001
+            return
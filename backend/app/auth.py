@@ -1,10 +1,13 @@
+import hashlib
+import threading
+import time
 from dataclasses import dataclass
 
 import jwt
 from fastapi import HTTPException, status
 from jwt import InvalidTokenError, PyJWKClient
 
-from .config import Settings
+from .config import RuntimeSettings
 
 
 @dataclass
@@ -16,6 +19,9 @@ class AuthContext:
 def extract_bearer_token(authorization_header: str | None) -> str | None:
     if not authorization_header:
         return None
+    # Fast path for the canonical form; anything else goes through the general parse.
+    if authorization_header.startswith(("Bearer ", "bearer ")):
+        return authorization_header[7:].strip() or None
     parts = authorization_header.strip().split(" ", 1)
     if len(parts) != 2:
         return None
@@ -26,12 +32,47 @@ def extract_bearer_token(authorization_header: str | None) -> str | None:
     return token or None
 
 
+# Verified tokens are reused until shortly before they expire.
+VERIFIED_TOKEN_CACHE_SIZE = 4096
+VERIFIED_TOKEN_EXPIRY_MARGIN_SECONDS = 30
+
+
 class ClerkTokenVerifier:
-    def __init__(self, settings: Settings) -> None:
+    def __init__(self, settings: RuntimeSettings) -> None:
         self.settings = settings
-        self.jwks_client = PyJWKClient(settings.clerk_jwks_url) if settings.clerk_jwks_url else None
+        self.jwks_client = (
+            PyJWKClient(settings.clerk_jwks_url, cache_keys=True, lifespan=3600, max_cached_keys=16)
+            if settings.clerk_jwks_url
+            else None
+        )
+        self._verified: dict[bytes, tuple[AuthContext, float]] = {}
+        self._verified_lock = threading.Lock()
+
+    def cached(self, token: str) -> AuthContext | None:
+        # Cheap enough to call on the event loop; only misses need verify().
+        cache_key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+        with self._verified_lock:
+            cached = self._verified.get(cache_key)
+        if cached is not None and cached[1] - time.time() > VERIFIED_TOKEN_EXPIRY_MARGIN_SECONDS:
+            return cached[0]
+        return None
 
     def verify(self, token: str) -> AuthContext:
+        context = self.cached(token)
+        if context is not None:
+            return context
+
+        cache_key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+        context = self._verify_signature(token)
+        expires_at = context.claims.get("exp")
+        if isinstance(expires_at, (int, float)):
+            with self._verified_lock:
+                if len(self._verified) >= VERIFIED_TOKEN_CACHE_SIZE:
+                    self._verified.pop(next(iter(self._verified)))
+                self._verified[cache_key] = (context, float(expires_at))
+        return context
+
+    def _verify_signature(self, token: str) -> AuthContext:
         if not self.jwks_client:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -1,9 +1,20 @@
-from dataclasses import dataclass
+from bisect import bisect_right
+from collections.abc import Iterable
+from dataclasses import dataclass, field
 
+import ahocorasick
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from .models import ClassificationRule
 
+CONTAINS_RULE_TYPES = (
+    "source_category_contains",
+    "merchant_contains",
+    "description_contains",
+    "text_contains",
+)
+
 
 @dataclass
 class Rule:
@@ -16,64 +27,209 @@ class Rule:
     is_active: bool
 
 
+@dataclass
+class RuleSet:
+    rules: list[Rule]
+    merchant_exact: dict[str, int] = field(default_factory=dict)
+    automatons: dict[str, ahocorasick.Automaton] = field(default_factory=dict)
+    # Shortest pattern per rule type: shorter texts cannot match, so the scan is skipped.
+    min_pattern_lengths: dict[str, int] = field(default_factory=dict)
+    # Rank of each type's highest-precedence rule: once a better hit is in hand
+    # (e.g. an exact merchant match), that type cannot win and is not scanned.
+    first_rule_indexes: dict[str, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+
+_RULES_CACHE: tuple[tuple, RuleSet] | None = None
+
+
 def _normalize_text(value: str) -> str:
-    return " ".join(value.lower().split()).strip()
+    if not value:
+        return ""
+    # str.split() already drops leading/trailing whitespace, so no strip() pass.
+    return " ".join(value.lower().split())
+
+
+def compile_rules(rules: list[Rule]) -> RuleSet:
+    # Rules arrive in precedence order, so a rule's index doubles as its rank:
+    # the lowest index among all hits is the rule the old linear scan returned.
+    ruleset = RuleSet(rules=rules)
+    for index, rule in enumerate(rules):
+        if not rule.pattern:
+            continue
+        if rule.rule_type == "merchant_exact":
+            ruleset.merchant_exact.setdefault(rule.pattern, index)
+            continue
+        if rule.rule_type not in CONTAINS_RULE_TYPES:
+            continue
+        automaton = ruleset.automatons.get(rule.rule_type)
+        if automaton is None:
+            automaton = ahocorasick.Automaton()
+            ruleset.automatons[rule.rule_type] = automaton
+        if rule.pattern not in automaton:
+            automaton.add_word(rule.pattern, index)
+        ruleset.first_rule_indexes.setdefault(rule.rule_type, index)
+        shortest = ruleset.min_pattern_lengths.get(rule.rule_type)
+        if shortest is None or len(rule.pattern) < shortest:
+            ruleset.min_pattern_lengths[rule.rule_type] = len(rule.pattern)
+    for automaton in ruleset.automatons.values():
+        automaton.make_automaton()
+    return ruleset
+
 
+def _rules_version(db: Session) -> tuple:
+    # Probe the whole table rather than only active rows so toggling is_active
+    # (which bumps updated_at) always changes the version.
+    count, latest_update = db.execute(
+        select(func.count(ClassificationRule.id), func.max(ClassificationRule.updated_at))
+    ).one()
+    return (int(count or 0), latest_update)
+
+
+def load_active_rules(db: Session) -> RuleSet:
+    global _RULES_CACHE
+    version = _rules_version(db)
+    cached = _RULES_CACHE
+    if cached is not None and cached[0] == version:
+        return cached[1]
 
-def load_active_rules(db: Session) -> list[Rule]:
     rows = (
         db.query(ClassificationRule)
         .filter(ClassificationRule.is_active == 1)
         .order_by(ClassificationRule.priority.asc(), ClassificationRule.created_at.asc())
         .all()
     )
-    return [
-        Rule(
-            id=row.id,
-            rule_type=row.rule_type,
-            pattern=_normalize_text(row.pattern),
-            category=row.category,
-            confidence=float(row.confidence),
-            priority=int(row.priority),
-            is_active=bool(row.is_active),
-        )
-        for row in rows
-    ]
+    ruleset = compile_rules(
+        [
+            Rule(
+                id=row.id,
+                rule_type=row.rule_type,
+                pattern=_normalize_text(row.pattern),
+                category=row.category,
+                confidence=float(row.confidence),
+                priority=int(row.priority),
+                is_active=bool(row.is_active),
+            )
+            for row in rows
+        ]
+    )
+    _RULES_CACHE = (version, ruleset)
+    return ruleset
+
+
+def _first_hit(rules: RuleSet, rule_type: str, text: str, best: int) -> int:
+    automaton = rules.automatons.get(rule_type)
+    if (
+        automaton is None
+        or best <= rules.first_rule_indexes[rule_type]
+        or len(text) < rules.min_pattern_lengths[rule_type]
+    ):
+        return best
+    for _, index in automaton.iter(text):
+        if index < best:
+            best = index
+    return best
 
 
 def classify_with_rules(
-    rules: list[Rule],
+    rules: RuleSet,
     description: str,
     merchant: str,
     source_category: str,
 ) -> tuple[str, float]:
-    description_normalized = _normalize_text(description)
-    merchant_normalized = _normalize_text(merchant)
-    source_category_normalized = _normalize_text(source_category)
-    combined_text = f"{description_normalized} {merchant_normalized}".strip()
+    return classify_normalized(
+        rules,
+        description_normalized=_normalize_text(description),
+        merchant_normalized=_normalize_text(merchant),
+        source_category_normalized=_normalize_text(source_category),
+    )
 
-    for rule in rules:
-        if not rule.pattern:
-            continue
-        if rule.rule_type == "source_category_contains":
-            if rule.pattern in source_category_normalized:
-                return rule.category, rule.confidence
-            continue
-        if rule.rule_type == "merchant_exact":
-            if merchant_normalized == rule.pattern:
-                return rule.category, rule.confidence
-            continue
-        if rule.rule_type == "merchant_contains":
-            if rule.pattern in merchant_normalized:
-                return rule.category, rule.confidence
-            continue
-        if rule.rule_type == "description_contains":
-            if rule.pattern in description_normalized:
-                return rule.category, rule.confidence
-            continue
-        if rule.rule_type == "text_contains":
-            if rule.pattern in combined_text:
-                return rule.category, rule.confidence
-            continue
 
+def classify_normalized(
+    rules: RuleSet,
+    description_normalized: str,
+    merchant_normalized: str,
+    source_category_normalized: str,
+) -> tuple[str, float]:
+    # Inputs must already be lowercased with whitespace collapsed (see _normalize_text).
+    if description_normalized and merchant_normalized:
+        combined_text = f"{description_normalized} {merchant_normalized}"
+    else:
+        combined_text = description_normalized or merchant_normalized
+
+    no_match = len(rules.rules)
+    best = rules.merchant_exact.get(merchant_normalized, no_match)
+    best = _first_hit(rules, "source_category_contains", source_category_normalized, best)
+    best = _first_hit(rules, "merchant_contains", merchant_normalized, best)
+    best = _first_hit(rules, "description_contains", description_normalized, best)
+    best = _first_hit(rules, "text_contains", combined_text, best)
+
+    if best < no_match:
+        rule = rules.rules[best]
+        return rule.category, rule.confidence
     return "uncategorized", 0.5
+
+
+def _scan_many(rules: RuleSet, rule_type: str, texts: list[str], best: list[int]) -> None:
+    automaton = rules.automatons.get(rule_type)
+    if automaton is None or max(best, default=0) <= rules.first_rule_indexes[rule_type]:
+        return
+    ends = []
+    offset = -1
+    for text in texts:
+        offset += len(text) + 1
+        ends.append(offset)
+    # Normalized texts and patterns never contain "\n", so no hit spans two rows.
+    # Hits come back in end-position order, so the row cursor only moves forward.
+    row = 0
+    row_end = ends[0] if ends else 0
+    for end, index in automaton.iter("\n".join(texts)):
+        if end >= row_end:
+            row = bisect_right(ends, end, row)
+            row_end = ends[row]
+        if index < best[row]:
+            best[row] = index
+
+
+def classify_many(
+    rules: RuleSet,
+    items: Iterable[tuple[str, str, str]],
+) -> list[tuple[str, float]]:
+    # Batched classify_with_rules over (description, merchant, source_category)
+    # triples: one automaton pass per rule type instead of one per row. Repeated
+    # inputs (recurring merchants) are classified once and share the result.
+    positions: dict[tuple[str, str, str], int] = {}
+    slots = []
+    descriptions = []
+    merchants = []
+    source_categories = []
+    for item in items:
+        slot = positions.get(item)
+        if slot is None:
+            slot = positions[item] = len(descriptions)
+            description, merchant, source_category = item
+            descriptions.append(_normalize_text(description))
+            merchants.append(_normalize_text(merchant))
+            source_categories.append(_normalize_text(source_category))
+        slots.append(slot)
+    combined_texts = [
+        f"{d} {m}" if d and m else d or m for d, m in zip(descriptions, merchants)
+    ]
+
+    no_match = len(rules.rules)
+    best = [rules.merchant_exact.get(m, no_match) for m in merchants]
+    _scan_many(rules, "source_category_contains", source_categories, best)
+    _scan_many(rules, "merchant_contains", merchants, best)
+    _scan_many(rules, "description_contains", descriptions, best)
+    _scan_many(rules, "text_contains", combined_texts, best)
+
+    results = []
+    for index in best:
+        if index < no_match:
+            rule = rules.rules[index]
+            results.append((rule.category, rule.confidence))
+        else:
+            results.append(("uncategorized", 0.5))
+    return [results[slot] for slot in slots]
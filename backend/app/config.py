@@ -1,5 +1,8 @@
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -13,7 +16,20 @@ class Settings(BaseSettings):
     cors_allow_origins: str = "*"
 
     database_url: str = "sqlite:///./data/app.db"
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_recycle_seconds: int = 1800
+    db_pool_timeout_seconds: int = 30
+    db_use_external_pooler: bool = False
+    db_prepare_threshold: int | None = None
+    db_insert_page_size: int = 1000
+    # Threads for sync routes; defaults to the DB pool's full capacity.
+    api_threadpool_size: int | None = None
     redis_url: str = "redis://localhost:6379/0"
+    # Import worker processes. More than one forks an RQ WorkerPool; each process
+    # has its own DB pool, and SQLite takes one writer at a time, so only raise it
+    # on Postgres with connections to spare.
+    import_worker_count: int = Field(default=1, ge=1)
     import_stale_minutes: int = 15
     rules_config_path: str = "config/classification_rules.json"
     rate_limit_enabled: bool = True
@@ -22,6 +38,7 @@ class Settings(BaseSettings):
     rate_limit_read_per_minute: int = 240
     rate_limit_write_per_minute: int = 60
     rate_limit_strict_per_minute: int = 12
+    analytics_cache_ttl_seconds: int = 60
     clerk_enabled: bool = False
     clerk_require_auth: bool = True
     clerk_jwks_url: str = ""
@@ -41,7 +58,60 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=BASE_DIR / ".env", extra="ignore")
 
 
-settings = Settings()
+# pydantic only parses the environment; request paths read a frozen, slotted
+# snapshot that cannot be mutated at runtime. Fields mirror Settings one for one:
+# get_settings() raises TypeError if the two drift apart.
+@dataclass(frozen=True, slots=True)
+class RuntimeSettings:
+    app_name: str
+    app_env: str
+    api_prefix: str
+    cors_allow_origins: str
+
+    database_url: str
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_recycle_seconds: int
+    db_pool_timeout_seconds: int
+    db_use_external_pooler: bool
+    db_prepare_threshold: int | None
+    db_insert_page_size: int
+    api_threadpool_size: int | None
+    redis_url: str
+    import_worker_count: int
+    import_stale_minutes: int
+    rules_config_path: str
+    rate_limit_enabled: bool
+    rate_limit_fail_open: bool
+    rate_limit_key_prefix: str
+    rate_limit_read_per_minute: int
+    rate_limit_write_per_minute: int
+    rate_limit_strict_per_minute: int
+    analytics_cache_ttl_seconds: int
+    clerk_enabled: bool
+    clerk_require_auth: bool
+    clerk_jwks_url: str
+    clerk_issuer: str
+    clerk_audience: str
+    admin_user_ids: str
+    log_level: str
+    log_json: bool
+    sentry_dsn: str
+    sentry_traces_sample_rate: float
+    ops_metrics_enabled: bool
+    ops_alert_queue_depth_threshold: int
+    ops_alert_failed_imports_threshold_24h: int
+    ops_alert_stale_processing_threshold: int
+    openai_api_key: str
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> RuntimeSettings:
+    # Single .env read per process; usable as a FastAPI dependency.
+    return RuntimeSettings(**Settings().model_dump())
+
+
+settings = get_settings()
 
 
 def cors_origins() -> list[str]:
@@ -1,7 +1,10 @@
 from collections.abc import Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import NullPool
 
 from .config import settings
 
@@ -15,24 +18,69 @@ def _normalize_database_url(url: str) -> str:
 
 
 def _build_engine_kwargs(database_url: str) -> dict:
-    kwargs: dict = {"future": True}
+    kwargs: dict = {"future": True, "pool_pre_ping": True}
+    if database_url.startswith("sqlite"):
+        # Sessions are handed across FastAPI's threadpool, so the connection must
+        # not be pinned to the thread that opened it.
+        kwargs["connect_args"] = {"check_same_thread": False}
+        return kwargs
+
+    kwargs["insertmanyvalues_page_size"] = settings.db_insert_page_size
+    if settings.db_use_external_pooler:
+        # PgBouncer (or similar) already pools server connections; a second pool
+        # here would only pin them. Each API and worker process otherwise holds
+        # up to db_pool_size + db_max_overflow connections, which must fit
+        # within the server's max_connections.
+        kwargs["poolclass"] = NullPool
+    else:
+        kwargs.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_recycle=settings.db_pool_recycle_seconds,
+            pool_timeout=settings.db_pool_timeout_seconds,
+            pool_use_lifo=True,
+        )
     if database_url.startswith("postgresql+psycopg://"):
-        # Avoid DuplicatePreparedStatement errors under pooled/forked runtime modes.
-        kwargs["connect_args"] = {"prepare_threshold": None}
+        # Server-side prepares stay off by default: they raise DuplicatePreparedStatement
+        # behind transaction-pooling proxies. Set DB_PREPARE_THRESHOLD on direct connections.
+        kwargs["connect_args"] = {"prepare_threshold": settings.db_prepare_threshold}
     return kwargs
 
 
+def _configure_sqlite_connection(dbapi_connection, _connection_record) -> None:
+    # WAL lets readers proceed while the import worker writes.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 class Base(DeclarativeBase):
     pass
 
 
 normalized_database_url = _normalize_database_url(settings.database_url)
 engine = create_engine(normalized_database_url, **_build_engine_kwargs(normalized_database_url))
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _configure_sqlite_connection)
+
+
+def insert_ignoring_conflicts(db: Session, model, index_elements: list[str]):
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        return postgresql_insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    if dialect_name == "sqlite":
+        return sqlite_insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    return insert(model)
+
+
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, class_=Session)
 
 
 def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
+    # Every column default is generated client-side, so reloading request objects
+    # after commit would only read back the values already in memory.
+    db = SessionLocal(expire_on_commit=False)
     try:
         yield db
     finally:
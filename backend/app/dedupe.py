@@ -1,5 +1,9 @@
 import hashlib
 from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Literal
+
+Direction = Literal["debit", "credit"]
 
 
 def normalize_merchant_name(merchant_name: str) -> str:
@@ -7,17 +11,43 @@ def normalize_merchant_name(merchant_name: str) -> str:
     return cleaned or "unknown"
 
 
+def normalize_user_scope(user_scope: str | None) -> str:
+    return (user_scope or "").strip().lower()
+
+
+def to_cents(amount: float) -> int:
+    # The fingerprint's amount has always been f"{abs(amount):.2f}", which rounds
+    # the exact binary value (2.675 -> 2.67); round(amount * 100) does not.
+    return int(f"{abs(amount):.2f}".replace(".", ""))
+
+
+_CENT = Decimal("0.01")
+
+
+def natural_key_cents(amount: float) -> int:
+    # Half away from zero on the decimal value (0.125 -> 13), the same as the
+    # database's round(cast(amount as numeric(18, 2)), 2). to_cents keeps the
+    # fingerprint's own rounding, so the two are not interchangeable.
+    return int(Decimal(repr(amount)).quantize(_CENT, rounding=ROUND_HALF_UP) * 100)
+
+
 def build_dedupe_fingerprint(
     transaction_date: date | None,
     merchant_name: str,
-    amount: float,
-    direction: str,
+    amount_cents: int,
+    direction: Direction,
     user_scope: str = "",
 ) -> str:
-    date_part = transaction_date.isoformat() if transaction_date else ""
-    merchant_part = normalize_merchant_name(merchant_name)
-    amount_part = f"{abs(amount):.2f}"
-    direction_part = direction.strip().lower()
-    scope_part = user_scope.strip().lower()
-    raw = f"{scope_part}|{date_part}|{merchant_part}|{amount_part}|{direction_part}"
-    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    # Callers pass an already-normalized scope (normalize_user_scope) and a
+    # canonical direction, so nothing is re-stripped or re-lowered per row.
+    raw = b"%s|%s|%s|%d.%02d|%s" % (
+        user_scope.encode("utf-8"),
+        transaction_date.isoformat().encode("ascii") if transaction_date else b"",
+        normalize_merchant_name(merchant_name).encode("utf-8"),
+        amount_cents // 100,
+        amount_cents % 100,
+        direction.encode("ascii"),
+    )
+    # Dedupe keys are not a security boundary; a 128-bit BLAKE2b digest is cheaper
+    # than SHA-256 for these short inputs and still fits the existing column.
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
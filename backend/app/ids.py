@@ -0,0 +1,16 @@
+import os
+import time
+import uuid
+
+_VERSION_MASK = ~(0xF << 76)
+_VARIANT_MASK = ~(0x3 << 62)
+
+
+def new_id() -> str:
+    # UUIDv7 (RFC 9562): a 48-bit millisecond timestamp ahead of the random bits,
+    # so new primary keys land at the right edge of their B-tree index instead
+    # of at random pages. Same 36-char text form as uuid4, so columns are unchanged.
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = value & _VERSION_MASK | 0x7 << 76
+    value = value & _VARIANT_MASK | 0x2 << 62
+    return str(uuid.UUID(int=value))
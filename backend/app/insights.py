@@ -1,22 +1,55 @@
-from collections import defaultdict
+import heapq
+from collections.abc import Iterable
+from operator import itemgetter
+
+from sqlalchemy import case, func, literal_column, select, union_all
+from sqlalchemy.orm import Session
 
 from .models import Transaction
 
 
-def build_spend_insight(transactions: list[Transaction]) -> dict:
-    total_spend = 0.0
-    by_category: dict[str, float] = defaultdict(float)
-    by_merchant: dict[str, float] = defaultdict(float)
+def spend_insight_from_db(db: Session, conditions: list) -> dict | None:
+    debit_amount = func.sum(case((Transaction.direction == "debit", Transaction.amount)))
+    merchant_total = func.sum(Transaction.amount)
+
+    # Grouping every row (not only debits) lets an empty result double as the
+    # "no transactions in range" signal; credit-only categories sum to NULL.
+    category_totals = select(
+        literal_column("'category'").label("kind"),
+        Transaction.category.label("name"),
+        debit_amount.label("total"),
+    ).where(*conditions).group_by(Transaction.category)
+    top_merchants = (
+        select(
+            literal_column("'merchant'").label("kind"),
+            Transaction.merchant_normalized.label("name"),
+            merchant_total.label("total"),
+        )
+        .where(Transaction.direction == "debit", *conditions)
+        .group_by(Transaction.merchant_normalized)
+        .order_by(merchant_total.desc(), Transaction.merchant_normalized.asc())
+        .limit(5)
+        .subquery()
+    )
+    # Both aggregates come back in one round trip.
+    rows = db.execute(union_all(category_totals, select(top_merchants))).all()
+    if not rows:
+        return None
+
+    category_rows = [(name, total) for kind, name, total in rows if kind == "category" and total is not None]
+    merchant_rows = [(name, total) for kind, name, total in rows if kind == "merchant"]
+    return build_spend_insight(category_totals=category_rows, merchant_totals=merchant_rows)
+
 
-    for txn in transactions:
-        if txn.direction != "debit":
-            continue
-        total_spend += txn.amount
-        by_category[txn.category] += txn.amount
-        by_merchant[txn.merchant_normalized] += txn.amount
+def build_spend_insight(
+    category_totals: Iterable[tuple[str, float]],
+    merchant_totals: Iterable[tuple[str, float]],
+) -> dict:
+    by_category = {category: float(total) for category, total in category_totals}
+    total_spend = sum(by_category.values())
 
-    top_categories = sorted(by_category.items(), key=lambda x: x[1], reverse=True)[:3]
-    top_merchants = sorted(by_merchant.items(), key=lambda x: x[1], reverse=True)[:5]
+    top_categories = heapq.nlargest(3, by_category.items(), key=itemgetter(1))
+    top_merchants = heapq.nlargest(5, ((m, float(a)) for m, a in merchant_totals), key=itemgetter(1))
 
     savings_actions = []
     for category, amount in top_categories:
@@ -1,24 +1,35 @@
+import asyncio
+import base64
+import codecs
 import json
 import hashlib
 import logging
 import re
 import uuid
-from datetime import UTC, date, datetime, timedelta
-import math
-
-from fastapi import Depends, FastAPI, File, HTTPException, Query, Request, UploadFile
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import BinaryIO
+
+import orjson
+from anyio import to_thread
+from fastapi import BackgroundTasks, Depends, FastAPI, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
-from sqlalchemy import Numeric, cast, func, select, true
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import and_, func, insert, or_, select, true, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from .auth import AuthContext, ClerkTokenVerifier, extract_bearer_token
+from .analytics_cache import AnalyticsCache
+from .auth import AuthContext, ClerkTokenVerifier
 from .config import cors_origins, settings
-from .db import Base, SessionLocal, engine, get_db
-from .dedupe import build_dedupe_fingerprint
+from .db import SessionLocal, get_db, insert_ignoring_conflicts
+from .dedupe import build_dedupe_fingerprint, natural_key_cents, normalize_user_scope, to_cents
+from .ids import new_id
 from .default_rule_seeds import DEFAULT_CLASSIFICATION_RULES
-from .classification_engine import classify_with_rules, load_active_rules
-from .insights import build_spend_insight
+from .classification_engine import classify_many, load_active_rules
+from .insights import spend_insight_from_db
+from .middleware import AuthMiddleware, ObserveMiddleware, RateLimitMiddleware
 from .models import (
     Category,
     ClassificationRule,
@@ -28,15 +39,11 @@ from .models import (
     Transaction,
     UploadedFile,
 )
-from .observability import configure_logging, init_sentry, monotonic_ms, utc_now_iso
+from .observability import configure_logging, init_sentry, utc_now_iso, utc_now_naive
 from .queue import enqueue_import, read_job_state, read_queue_metrics
-from .rate_limit import (
-    RedisTokenBucketLimiter,
-    pick_rate_limit_policy,
-    resolve_rate_limit_identity,
-)
+from .rate_limit import RedisTokenBucketLimiter
 from .rule_config import load_rules_config_file, resolve_rules_config_path, save_rules_config_file
-from .schema import ensure_schema_compatibility
+from .schema import ensure_schema
 from .schemas import (
     CategoryCreateRequest,
     CategoryResponse,
@@ -82,16 +89,37 @@ DEFAULT_CATEGORIES = [
     "uncategorized",
 ]
 
-ALLOWED_RULE_TYPES = {
-    "source_category_contains",
-    "merchant_exact",
-    "merchant_contains",
-    "description_contains",
-    "text_contains",
-}
+ALLOWED_RULE_TYPES = frozenset(
+    {
+        "source_category_contains",
+        "merchant_exact",
+        "merchant_contains",
+        "description_contains",
+        "text_contains",
+    }
+)
 
-ALLOWED_DUPLICATE_REVIEW_STATUS = {"pending", "confirmed_duplicate", "ignored"}
+ALLOWED_DUPLICATE_REVIEW_STATUS = frozenset({"pending", "confirmed_duplicate", "ignored"})
+UNSUPPORTED_RULE_TYPE_MESSAGE = "Unsupported rule_type. Allowed values: " + ", ".join(sorted(ALLOWED_RULE_TYPES))
+UNSUPPORTED_DUPLICATE_REVIEW_STATUS_MESSAGE = "Unsupported duplicate review status. Allowed values: " + ", ".join(
+    sorted(ALLOWED_DUPLICATE_REVIEW_STATUS)
+)
 BULK_DUPLICATE_REVIEW_MAX = 500
+UPLOAD_READ_CHUNK_BYTES = 64 * 1024
+# Ids per bulk UPDATE; keeps IN lists well under SQLite's bind-parameter limit.
+UPDATE_ID_CHUNK_SIZE = 5000
+RECATEGORIZE_BATCH_SIZE = 2000
+CATEGORY_NAME_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Categories are never deleted, so a name seen in the database stays valid.
+_KNOWN_CATEGORIES: set[str] = set()
+DEDUPE_FINGERPRINT_CANDIDATES = 8
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+CURSOR_WITH_OFFSET_MESSAGE = "offset cannot be combined with cursor"
+
+TRANSACTION_RESPONSE_COLUMNS = tuple(getattr(Transaction, name) for name in TransactionResponse.model_fields)
+DUPLICATE_REVIEW_RESPONSE_COLUMNS = tuple(
+    getattr(DuplicateReview, name) for name in DuplicateReviewResponse.model_fields
+)
 
 configure_logging("expense_tracker.api")
 init_sentry("expense_tracker.api")
@@ -99,43 +127,23 @@ logger = logging.getLogger("expense_tracker.api")
 ADMIN_USER_IDS = {value.strip() for value in settings.admin_user_ids.split(",") if value.strip()}
 
 
-app = FastAPI(title=settings.app_name)
+app = FastAPI(title=settings.app_name, default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins(),
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "X-Report-Pending"],
 )
 rate_limiter = RedisTokenBucketLimiter(settings.redis_url, key_prefix=settings.rate_limit_key_prefix)
+analytics_cache = AnalyticsCache(settings.redis_url, ttl_seconds=settings.analytics_cache_ttl_seconds)
 token_verifier = ClerkTokenVerifier(settings) if settings.clerk_enabled else None
-
-
-def _attach_cors_headers(request: Request, response: Response) -> Response:
-    origin = request.headers.get("origin", "").strip()
-    allowed = cors_origins()
-    allow_all = "*" in allowed
-    if allow_all:
-        response.headers["Access-Control-Allow-Origin"] = "*"
-    elif origin and origin in allowed:
-        response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Vary"] = "Origin"
-    response.headers["Access-Control-Allow-Methods"] = "*"
-    response.headers["Access-Control-Allow-Headers"] = "*"
-    return response
-
-
-def _json_api_error(request: Request, status_code: int, detail: str) -> JSONResponse:
-    response = JSONResponse(status_code=status_code, content={"detail": detail})
-    request_id = getattr(request.state, "request_id", None)
-    if request_id:
-        response.headers["X-Request-Id"] = request_id
-    return _attach_cors_headers(request, response)
-
-
-def _get_request_id(request: Request) -> str:
-    incoming = request.headers.get("x-request-id", "").strip()
-    return incoming or str(uuid.uuid4())
+# add_middleware wraps the existing stack, so the last one added runs first:
+# rate limit -> auth -> observe -> CORS -> routes.
+app.add_middleware(ObserveMiddleware)
+app.add_middleware(AuthMiddleware, token_verifier=token_verifier)
+app.add_middleware(RateLimitMiddleware, rate_limiter=rate_limiter)
 
 
 def _get_auth_context(request: Request) -> AuthContext | None:
@@ -176,146 +184,41 @@ def _apply_user_scope(query, model, user_id: str | None):
     return query.filter(model.user_id == user_id)
 
 
-def _build_user_condition(model, user_id: str | None):
-    if not settings.clerk_enabled:
-        return true()
-    if user_id is None:
-        return model.user_id.is_(None)
-    return model.user_id == user_id
+def _encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
 
 
-def _apply_rate_limit_headers(
-    response: Response,
-    limit: int,
-    remaining: float,
-    policy_name: str,
-    retry_after_seconds: int | None = None,
-) -> None:
-    response.headers["X-RateLimit-Limit"] = str(limit)
-    response.headers["X-RateLimit-Remaining"] = str(max(0, int(math.floor(remaining))))
-    response.headers["X-RateLimit-Policy"] = policy_name
-    if retry_after_seconds is not None:
-        response.headers["Retry-After"] = str(max(1, retry_after_seconds))
-
-
-@app.middleware("http")
-async def observe_http_request(request: Request, call_next):
-    request_id = _get_request_id(request)
-    request.state.request_id = request_id
-    started_ms = monotonic_ms()
+def _decode_cursor(cursor: str, parsers: tuple) -> list:
     try:
-        response = await call_next(request)
-    except Exception:  # noqa: BLE001
-        duration_ms = round(monotonic_ms() - started_ms, 2)
-        logger.exception(
-            "request_unhandled_exception",
-            extra={
-                "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "duration_ms": duration_ms,
-            },
-        )
-        raise
-
-    duration_ms = round(monotonic_ms() - started_ms, 2)
-    response.headers["X-Request-Id"] = request_id
-    user_id = getattr(getattr(request.state, "auth_context", None), "user_id", None)
-    logger.info(
-        "request_complete",
-        extra={
-            "request_id": request_id,
-            "method": request.method,
-            "path": request.url.path,
-            "status_code": response.status_code,
-            "duration_ms": duration_ms,
-            "user_id": user_id,
-        },
-    )
-    return response
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if len(values) != len(parsers):
+            raise ValueError("cursor size mismatch")
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
 
 
-@app.middleware("http")
-async def enforce_authentication(request: Request, call_next):
-    request.state.auth_context = None
-    if not settings.clerk_enabled:
-        return await call_next(request)
-    if request.method.upper() == "OPTIONS":
-        return await call_next(request)
-    if not request.url.path.startswith(settings.api_prefix):
-        return await call_next(request)
-
-    token = extract_bearer_token(request.headers.get("Authorization"))
-    if not token:
-        if settings.clerk_require_auth:
-            return _json_api_error(request=request, status_code=401, detail="Missing bearer token")
-        return await call_next(request)
+def _parse_optional_date(value: str | None) -> date | None:
+    return None if value is None else date.fromisoformat(value)
 
-    try:
-        if token_verifier is None:
-            return _json_api_error(request=request, status_code=503, detail="Clerk is not configured")
-        request.state.auth_context = token_verifier.verify(token)
-    except HTTPException as exc:
-        return _json_api_error(request=request, status_code=exc.status_code, detail=str(exc.detail))
-
-    return await call_next(request)
-
-
-@app.middleware("http")
-async def enforce_rate_limit(request: Request, call_next):
-    if not settings.rate_limit_enabled:
-        return await call_next(request)
-    if request.method.upper() == "OPTIONS":
-        return await call_next(request)
-    if not request.url.path.startswith(settings.api_prefix):
-        return await call_next(request)
-
-    policy = pick_rate_limit_policy(request.method, request.url.path, settings)
-    identity = resolve_rate_limit_identity(request)
-    decision = rate_limiter.consume(policy=policy, identity=identity)
-
-    if decision.error and not settings.rate_limit_fail_open:
-        return _json_api_error(
-            request=request,
-            status_code=503,
-            detail="Rate limiter unavailable. Try again shortly.",
-        )
 
-    if not decision.allowed:
-        retry_after_seconds = int(max(1, math.ceil(decision.retry_after_ms / 1000.0)))
-        response = JSONResponse(
-            status_code=429,
-            content={
-                "detail": "Rate limit exceeded",
-                "policy": policy.name,
-                "retry_after_seconds": retry_after_seconds,
-            },
-        )
-        _apply_rate_limit_headers(
-            response=response,
-            limit=policy.capacity,
-            remaining=decision.remaining_tokens,
-            policy_name=policy.name,
-            retry_after_seconds=retry_after_seconds,
-        )
-        return _attach_cors_headers(request, response)
-
-    response = await call_next(request)
-    _apply_rate_limit_headers(
-        response=response,
-        limit=policy.capacity,
-        remaining=decision.remaining_tokens,
-        policy_name=policy.name,
-    )
-    if decision.error and settings.rate_limit_fail_open:
-        response.headers["X-RateLimit-Bypass"] = "redis_unavailable"
-    return response
+def _build_user_condition(model, user_id: str | None):
+    if not settings.clerk_enabled:
+        return true()
+    if user_id is None:
+        return model.user_id.is_(None)
+    return model.user_id == user_id
 
 
 @app.on_event("startup")
 def on_startup() -> None:
-    Base.metadata.create_all(bind=engine)
-    ensure_schema_compatibility()
+    # Sync routes hold a thread for as long as they hold a pooled connection, so
+    # the default 40 threads would cap concurrency below what the pool allows.
+    to_thread.current_default_thread_limiter().total_tokens = settings.api_threadpool_size or (
+        settings.db_pool_size + settings.db_max_overflow
+    )
+    ensure_schema()
     with SessionLocal() as session:
         _seed_default_categories(session)
         _seed_default_classification_rules(session)
@@ -333,33 +236,33 @@ def on_startup() -> None:
 
 def _mark_failed(record: StatementImport, db: Session, reason: str) -> None:
     record.status = "failed"
-    record.finished_at = datetime.now(UTC).replace(tzinfo=None)
+    record.finished_at = utc_now_naive()
     record.error_message = reason[:1000]
     db.commit()
-    db.refresh(record)
 
 
+@lru_cache(maxsize=256)
 def _normalize_category_name(name: str) -> str:
-    normalized = re.sub(r"[^a-z0-9_]+", "_", name.strip().lower())
-    normalized = re.sub(r"_+", "_", normalized).strip("_")
+    # Joining the alphanumeric runs is the same as mapping every other run to a
+    # single "_" and trimming the ends.
+    normalized = "_".join(CATEGORY_NAME_TOKEN_RE.findall(name.lower()))
     if not normalized:
         raise ValueError("Category name must contain letters or numbers")
     return normalized[:64]
 
 
 def _seed_default_categories(db: Session) -> None:
-    existing = {row.name for row in db.query(Category).all()}
+    existing = set(db.scalars(select(Category.name)))
     missing = [name for name in DEFAULT_CATEGORIES if name not in existing]
     if not missing:
         return
-    for name in missing:
-        db.add(Category(name=name))
+    # ON CONFLICT DO NOTHING keeps concurrent worker startups from racing on the unique name.
+    db.execute(insert_ignoring_conflicts(db, Category, ["name"]), [{"name": name} for name in missing])
     db.commit()
 
 
 def _seed_default_classification_rules(db: Session) -> None:
-    existing_count = db.query(ClassificationRule.id).count()
-    if existing_count > 0:
+    if db.scalar(select(ClassificationRule.id).limit(1)) is not None:
         return
 
     try:
@@ -370,66 +273,140 @@ def _seed_default_classification_rules(db: Session) -> None:
         configured_rules = [dict(item, is_active=True) for item in DEFAULT_CLASSIFICATION_RULES]
         save_rules_config_file(configured_rules)
 
-    for item in configured_rules:
-        row = ClassificationRule(
-            rule_type=item["rule_type"],
-            pattern=item["pattern"],
-            category=item["category"],
-            confidence=float(item["confidence"]),
-            priority=int(item["priority"]),
-            is_active=1 if bool(item.get("is_active", True)) else 0,
-        )
-        db.add(row)
+    db.execute(
+        insert(ClassificationRule),
+        [
+            {
+                "rule_type": item["rule_type"],
+                "pattern": item["pattern"],
+                "category": item["category"],
+                "confidence": float(item["confidence"]),
+                "priority": int(item["priority"]),
+                "is_active": 1 if bool(item.get("is_active", True)) else 0,
+            }
+            for item in configured_rules
+        ],
+    )
     db.commit()
 
 
 def _resolve_category(name: str, db: Session, create_if_missing: bool = False) -> str:
     normalized = _normalize_category_name(name)
-    found = db.query(Category).filter(Category.name == normalized).one_or_none()
+    if normalized in _KNOWN_CATEGORIES:
+        return normalized
+    found = db.scalars(select(Category).where(Category.name == normalized)).one_or_none()
     if found is not None:
+        # A category flushed by this session can still roll back, so only
+        # remember names that were already in the database.
+        if found.name not in db.info.get("created_categories", ()):
+            _KNOWN_CATEGORIES.add(found.name)
         return found.name
     if create_if_missing:
         db.add(Category(name=normalized))
         db.flush()
+        db.info.setdefault("created_categories", set()).add(normalized)
         return normalized
     raise ValueError(f"Category '{normalized}' does not exist")
 
 
+def _resolve_categories(names: list[str], db: Session, create_if_missing: bool = False) -> list[str]:
+    # Batched _resolve_category: one lookup for every unknown name and one insert
+    # for the missing ones.
+    normalized = [_normalize_category_name(name) for name in names]
+    unknown = set(normalized) - _KNOWN_CATEGORIES
+    if not unknown:
+        return normalized
+    created = db.info.get("created_categories", ())
+    found = set(db.scalars(select(Category.name).where(Category.name.in_(unknown))))
+    _KNOWN_CATEGORIES.update(name for name in found if name not in created)
+    missing = unknown - found
+    if missing:
+        if not create_if_missing:
+            missing_name = next(name for name in normalized if name in missing)
+            raise ValueError(f"Category '{missing_name}' does not exist")
+        db.execute(insert_ignoring_conflicts(db, Category, ["name"]), [{"name": name} for name in sorted(missing)])
+        db.info.setdefault("created_categories", set()).update(missing)
+    return normalized
+
+
 def _normalize_rule_type(value: str) -> str:
+    if value in ALLOWED_RULE_TYPES:
+        return value
     rule_type = value.strip().lower()
     if rule_type not in ALLOWED_RULE_TYPES:
-        raise ValueError(
-            "Unsupported rule_type. Allowed values: "
-            + ", ".join(sorted(ALLOWED_RULE_TYPES))
-        )
+        raise ValueError(UNSUPPORTED_RULE_TYPE_MESSAGE)
     return rule_type
 
 
-def _ensure_unique_dedupe_fingerprint(base_fingerprint: str, review_id: str, db: Session) -> str:
-    candidate = base_fingerprint
+def _ensure_unique_dedupe_fingerprint(
+    base_fingerprint: str,
+    review_id: str,
+    db: Session,
+    reserved: set[str] | frozenset[str] = frozenset(),
+) -> str:
+    # Candidates keep their original order (base, then attempt 0, 1, ...); each
+    # window is checked with one IN query and doubles if every candidate is taken.
+    candidates = [base_fingerprint]
     attempt = 0
-    while db.execute(
-        select(Transaction.id).where(Transaction.dedupe_fingerprint == candidate)
-    ).scalar_one_or_none() is not None:
-        raw = f"{base_fingerprint}|approved|{review_id}|{attempt}"
-        candidate = hashlib.sha256(raw.encode("utf-8")).hexdigest()
-        attempt += 1
-    return candidate
-
-
-def _apply_duplicate_review_action(row: DuplicateReview, action: str, db: Session) -> str | None:
+    window = DEDUPE_FINGERPRINT_CANDIDATES
+    while True:
+        while len(candidates) < window:
+            raw = f"{base_fingerprint}|approved|{review_id}|{attempt}"
+            candidates.append(hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest())
+            attempt += 1
+        taken = set(
+            db.execute(
+                select(Transaction.dedupe_fingerprint).where(Transaction.dedupe_fingerprint.in_(candidates))
+            ).scalars()
+        )
+        for candidate in candidates:
+            if candidate not in taken and candidate not in reserved:
+                return candidate
+        candidates = []
+        window *= 2
+
+
+def _assign_dedupe_fingerprints(rows: list[DuplicateReview], db: Session) -> dict[str, str]:
+    # Base fingerprints rarely collide, so they are all checked in one query and
+    # only colliding rows fall back to the candidate search. Fingerprints handed
+    # out earlier in the batch are not flushed yet, so they are tracked here.
+    bases = {row.dedupe_fingerprint for row in rows}
+    taken = set()
+    if bases:
+        taken = set(
+            db.execute(select(Transaction.dedupe_fingerprint).where(Transaction.dedupe_fingerprint.in_(bases))).scalars()
+        )
+    assigned: dict[str, str] = {}
+    reserved: set[str] = set()
+    for row in rows:
+        fingerprint = row.dedupe_fingerprint
+        if fingerprint in taken or fingerprint in reserved:
+            fingerprint = _ensure_unique_dedupe_fingerprint(fingerprint, row.id, db, reserved)
+        reserved.add(fingerprint)
+        assigned[row.id] = fingerprint
+    return assigned
+
+
+def _apply_duplicate_review_action(
+    row: DuplicateReview,
+    action: str,
+    db: Session,
+    dedupe_fingerprint: str | None = None,
+) -> str | None:
     if action == "mark_duplicate":
         db.delete(row)
         return None
 
     if action == "not_duplicate":
-        dedupe_fingerprint = _ensure_unique_dedupe_fingerprint(
-            base_fingerprint=row.dedupe_fingerprint,
-            review_id=row.id,
-            db=db,
-        )
+        if dedupe_fingerprint is None:
+            dedupe_fingerprint = _ensure_unique_dedupe_fingerprint(
+                base_fingerprint=row.dedupe_fingerprint,
+                review_id=row.id,
+                db=db,
+            )
 
         txn = Transaction(
+            id=new_id(),
             user_id=row.user_id,
             source_import_id=row.source_import_id,
             transaction_date=row.transaction_date,
@@ -446,11 +423,10 @@ def _apply_duplicate_review_action(row: DuplicateReview, action: str, db: Sessio
 
         source_import = db.get(StatementImport, row.source_import_id)
         if source_import is not None:
+            # updated_at is stamped once per flush by the column's onupdate.
             source_import.processed_rows = (source_import.processed_rows or 0) + 1
-            source_import.updated_at = datetime.now(UTC).replace(tzinfo=None)
 
         db.delete(row)
-        db.flush()
         return txn.id
 
     raise ValueError("Unsupported action for duplicate review resolution")
@@ -464,13 +440,13 @@ def _get_or_create_manual_import(db: Session, user_id: str | None) -> StatementI
         return existing
 
     row = StatementImport(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         user_id=user_id if settings.clerk_enabled else None,
         filename="manual_entries",
         status="manual",
         total_rows=0,
         processed_rows=0,
-        finished_at=datetime.now(UTC).replace(tzinfo=None),
+        finished_at=utc_now_naive(),
     )
     db.add(row)
     db.flush()
@@ -481,7 +457,7 @@ def _sync_import_status(record: StatementImport, db: Session) -> StatementImport
     if record.status in {"completed", "failed"}:
         return record
 
-    age = datetime.now(UTC).replace(tzinfo=None) - record.updated_at
+    age = utc_now_naive() - record.updated_at
     stale_threshold = timedelta(minutes=max(1, settings.import_stale_minutes))
 
     if not record.queue_job_id:
@@ -539,118 +515,67 @@ def _sync_import_status(record: StatementImport, db: Session) -> StatementImport
 
 
 def _to_import_response(record: StatementImport) -> StatementImportResponse:
-    return StatementImportResponse(
-        id=record.id,
-        filename=record.filename,
-        status=record.status,
-        queue_job_id=record.queue_job_id,
-        total_rows=record.total_rows,
-        processed_rows=record.processed_rows,
-        error_message=record.error_message,
-        processing_started_at=record.processing_started_at,
-        finished_at=record.finished_at,
-        created_at=record.created_at,
-        updated_at=record.updated_at,
-    )
+    return StatementImportResponse.model_validate(record)
 
 
 def _to_transaction_response(row: Transaction) -> TransactionResponse:
-    return TransactionResponse(
-        id=row.id,
-        source_import_id=row.source_import_id,
-        transaction_date=row.transaction_date,
-        description_raw=row.description_raw,
-        merchant_normalized=row.merchant_normalized,
-        amount=row.amount,
-        currency=row.currency,
-        direction=row.direction,
-        category=row.category,
-        category_confidence=row.category_confidence,
-        created_at=row.created_at,
-    )
+    return TransactionResponse.model_validate(row)
 
 
 def _to_category_response(row: Category) -> CategoryResponse:
-    return CategoryResponse(id=row.id, name=row.name, created_at=row.created_at)
+    return CategoryResponse.model_validate(row)
 
 
 def _to_rule_response(row: ClassificationRule) -> ClassificationRuleResponse:
-    return ClassificationRuleResponse(
-        id=row.id,
-        rule_type=row.rule_type,
-        pattern=row.pattern,
-        category=row.category,
-        confidence=float(row.confidence),
-        priority=int(row.priority),
-        is_active=bool(row.is_active),
-        created_at=row.created_at,
-        updated_at=row.updated_at,
-    )
+    return ClassificationRuleResponse.model_validate(row)
 
 
 def _to_duplicate_review_response(row: DuplicateReview) -> DuplicateReviewResponse:
-    return DuplicateReviewResponse(
-        id=row.id,
-        source_import_id=row.source_import_id,
-        source_row_number=row.source_row_number,
-        duplicate_scope=row.duplicate_scope,
-        duplicate_reason=row.duplicate_reason,
-        matched_transaction_id=row.matched_transaction_id,
-        transaction_date=row.transaction_date,
-        description_raw=row.description_raw,
-        merchant_normalized=row.merchant_normalized,
-        amount=row.amount,
-        currency=row.currency,
-        direction=row.direction,
-        category=row.category,
-        category_confidence=float(row.category_confidence),
-        dedupe_fingerprint=row.dedupe_fingerprint,
-        status=row.status,
-        review_note=row.review_note,
-        created_at=row.created_at,
-        reviewed_at=row.reviewed_at,
-    )
+    return DuplicateReviewResponse.model_validate(row)
 
 
 def _normalize_duplicate_review_status(value: str) -> str:
+    if value in ALLOWED_DUPLICATE_REVIEW_STATUS:
+        return value
     status = value.strip().lower()
     if status not in ALLOWED_DUPLICATE_REVIEW_STATUS:
-        raise ValueError(
-            "Unsupported duplicate review status. Allowed values: "
-            + ", ".join(sorted(ALLOWED_DUPLICATE_REVIEW_STATUS))
-        )
+        raise ValueError(UNSUPPORTED_DUPLICATE_REVIEW_STATUS_MESSAGE)
     return status
 
 
-def _build_ops_snapshot(db: Session) -> dict:
-    now = datetime.now(UTC).replace(tzinfo=None)
+def _read_ops_counts(db: Session, since_24h: datetime, stale_cutoff: datetime) -> tuple[int, int, int]:
+    # One round-trip: each count is a scalar subquery of a single SELECT.
+    return db.execute(
+        select(
+            select(func.count(StatementImport.id))
+            .where(
+                StatementImport.status == "failed",
+                StatementImport.updated_at >= since_24h,
+            )
+            .scalar_subquery(),
+            select(func.count(StatementImport.id))
+            .where(
+                StatementImport.status == "processing",
+                StatementImport.updated_at < stale_cutoff,
+            )
+            .scalar_subquery(),
+            select(func.count(DuplicateReview.id))
+            .where(DuplicateReview.status == "pending")
+            .scalar_subquery(),
+        )
+    ).one()
+
+
+async def _build_ops_snapshot(db: Session) -> dict:
+    now = utc_now_naive()
     since_24h = now - timedelta(hours=24)
     stale_cutoff = now - timedelta(minutes=max(1, settings.import_stale_minutes))
 
-    queue_metrics = read_queue_metrics("imports")
-    failed_imports_24h = (
-        db.query(func.count(StatementImport.id))
-        .filter(
-            StatementImport.status == "failed",
-            StatementImport.updated_at >= since_24h,
-        )
-        .scalar()
-        or 0
-    )
-    stale_processing_imports = (
-        db.query(func.count(StatementImport.id))
-        .filter(
-            StatementImport.status == "processing",
-            StatementImport.updated_at < stale_cutoff,
-        )
-        .scalar()
-        or 0
-    )
-    pending_duplicate_reviews = (
-        db.query(func.count(DuplicateReview.id))
-        .filter(DuplicateReview.status == "pending")
-        .scalar()
-        or 0
+    # The RQ registry reads and the database counts are independent, so both
+    # blocking calls run on the threadpool at the same time.
+    queue_metrics, (failed_imports_24h, stale_processing_imports, pending_duplicate_reviews) = await asyncio.gather(
+        run_in_threadpool(read_queue_metrics, "imports"),
+        run_in_threadpool(_read_ops_counts, db, since_24h, stale_cutoff),
     )
 
     alerts: list[dict] = []
@@ -738,35 +663,54 @@ async def create_import(
     request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)
 ) -> StatementImportResponse:
     user_id = _get_request_user_id(request)
-    import_id = str(uuid.uuid4())
+    import_id = new_id()
     filename = file.filename or f"statement-{import_id}.csv"
-    raw_content = await file.read()
-    decoded_content = raw_content.decode("utf-8-sig", errors="ignore")
+    # Decoding, the session and the enqueue (which falls back to processing
+    # inline) are all blocking, so run them on the threadpool rather than the
+    # event loop. The upload is already spooled by the form parser.
+    return await run_in_threadpool(_persist_import, db, import_id, user_id, filename, file.file)
+
+
+def _read_upload_text(stream: BinaryIO) -> str:
+    # Decode chunk by chunk so the raw upload is never held in memory alongside the text.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="ignore")
+    decoded_parts = []
+    while chunk := stream.read(UPLOAD_READ_CHUNK_BYTES):
+        decoded_parts.append(decoder.decode(chunk))
+    decoded_parts.append(decoder.decode(b"", final=True))
+    return "".join(decoded_parts)
 
+
+def _persist_import(
+    db: Session, import_id: str, user_id: str | None, filename: str, stream: BinaryIO
+) -> StatementImportResponse:
+    content_text = _read_upload_text(stream)
     record = StatementImport(
         id=import_id,
         user_id=user_id if settings.clerk_enabled else None,
         filename=filename,
         status="queued",
+        # The job id is assigned up front so the row is written once, with it
+        # already set; the worker needs the row committed before the job exists.
+        queue_job_id=str(uuid.uuid4()),
     )
-    uploaded_file = UploadedFile(import_id=import_id, original_filename=filename, content_text=decoded_content)
+    uploaded_file = UploadedFile(import_id=import_id, original_filename=filename, content_text=content_text)
     db.add(record)
     db.add(uploaded_file)
     db.commit()
-    db.refresh(record)
 
-    job_id = enqueue_import(import_id=record.id)
-    if job_id:
-        record.queue_job_id = job_id
+    if enqueue_import(import_id=record.id, job_id=record.queue_job_id) is None:
+        # Without Redis the import already ran inline in its own session.
+        record.queue_job_id = None
         db.commit()
-    db.refresh(record)
+        db.refresh(record)
 
     return _to_import_response(record)
 
 
 @app.get(f"{settings.api_prefix}/categories", response_model=list[CategoryResponse])
 def list_categories(db: Session = Depends(get_db)) -> list[CategoryResponse]:
-    rows = db.query(Category).order_by(Category.name.asc()).all()
+    rows = db.scalars(select(Category).order_by(Category.name.asc())).all()
     return [_to_category_response(row) for row in rows]
 
 
@@ -778,14 +722,16 @@ def create_category(payload: CategoryCreateRequest, request: Request, db: Sessio
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    existing = db.query(Category).filter(Category.name == normalized).one_or_none()
+    existing = db.scalars(select(Category).where(Category.name == normalized)).one_or_none()
     if existing is not None:
+        _KNOWN_CATEGORIES.add(existing.name)
         return _to_category_response(existing)
 
     row = Category(name=normalized)
     db.add(row)
     db.commit()
-    db.refresh(row)
+    # Committed, so later lookups for this name can skip the database.
+    _KNOWN_CATEGORIES.add(normalized)
     return _to_category_response(row)
 
 
@@ -795,17 +741,18 @@ def list_classification_rules(
     is_active: bool | None = Query(default=None),
     db: Session = Depends(get_db),
 ) -> list[ClassificationRuleResponse]:
-    query = db.query(ClassificationRule)
+    stmt = select(ClassificationRule)
     if rule_type is not None:
         try:
             normalized = _normalize_rule_type(rule_type)
         except ValueError as exc:
             raise HTTPException(status_code=400, detail=str(exc)) from exc
-        query = query.filter(ClassificationRule.rule_type == normalized)
+        stmt = stmt.where(ClassificationRule.rule_type == normalized)
     if is_active is not None:
-        query = query.filter(ClassificationRule.is_active == (1 if is_active else 0))
+        stmt = stmt.where(ClassificationRule.is_active == (1 if is_active else 0))
 
-    rows = query.order_by(ClassificationRule.priority.asc(), ClassificationRule.created_at.asc()).all()
+    stmt = stmt.order_by(ClassificationRule.priority.asc(), ClassificationRule.created_at.asc())
+    rows = db.scalars(stmt).all()
     return [_to_rule_response(row) for row in rows]
 
 
@@ -830,7 +777,6 @@ def create_classification_rule(
     )
     db.add(row)
     db.commit()
-    db.refresh(row)
     return _to_rule_response(row)
 
 
@@ -860,7 +806,6 @@ def update_classification_rule(
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     db.commit()
-    db.refresh(row)
     return _to_rule_response(row)
 
 
@@ -884,21 +829,27 @@ def save_classification_rules_config(
     request: Request, db: Session = Depends(get_db)
 ) -> ClassificationRuleConfigSaveResponse:
     _require_admin(request)
-    rows = (
-        db.query(ClassificationRule)
-        .order_by(ClassificationRule.priority.asc(), ClassificationRule.created_at.asc())
-        .all()
+    # Plain column rows: the export never needs ORM instances.
+    rows = db.execute(
+        select(
+            ClassificationRule.rule_type,
+            ClassificationRule.pattern,
+            ClassificationRule.category,
+            ClassificationRule.confidence,
+            ClassificationRule.priority,
+            ClassificationRule.is_active,
+        ).order_by(ClassificationRule.priority.asc(), ClassificationRule.created_at.asc())
     )
     payload = [
         {
-            "rule_type": row.rule_type,
-            "pattern": row.pattern,
-            "category": row.category,
-            "confidence": float(row.confidence),
-            "priority": int(row.priority),
-            "is_active": bool(row.is_active),
+            "rule_type": rule_type,
+            "pattern": pattern,
+            "category": category,
+            "confidence": float(confidence),
+            "priority": int(priority),
+            "is_active": bool(is_active),
         }
-        for row in rows
+        for rule_type, pattern, category, confidence, priority, is_active in rows
     ]
     path = save_rules_config_file(payload)
     return ClassificationRuleConfigSaveResponse(path=str(path), exported_rules=len(payload))
@@ -928,29 +879,30 @@ def load_classification_rules_config(
         db.query(ClassificationRule).delete()
         db.commit()
 
-    loaded_count = 0
-    for item in file_rules:
-        try:
-            normalized_rule_type = _normalize_rule_type(item["rule_type"])
-            normalized_category = _resolve_category(item["category"], db, create_if_missing=True)
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail=str(exc)) from exc
-
-        row = ClassificationRule(
-            rule_type=normalized_rule_type,
-            pattern=item["pattern"].strip().lower(),
-            category=normalized_category,
-            confidence=float(item["confidence"]),
-            priority=int(item["priority"]),
-            is_active=1 if bool(item.get("is_active", True)) else 0,
-        )
-        db.add(row)
-        loaded_count += 1
+    try:
+        rule_types = [_normalize_rule_type(item["rule_type"]) for item in file_rules]
+        categories = _resolve_categories([item["category"] for item in file_rules], db, create_if_missing=True)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
+    db.execute(
+        insert(ClassificationRule),
+        [
+            {
+                "rule_type": rule_type,
+                "pattern": item["pattern"].strip().lower(),
+                "category": category,
+                "confidence": float(item["confidence"]),
+                "priority": int(item["priority"]),
+                "is_active": 1 if bool(item.get("is_active", True)) else 0,
+            }
+            for item, rule_type, category in zip(file_rules, rule_types, categories)
+        ],
+    )
     db.commit()
     return ClassificationRuleConfigLoadResponse(
         path=str(resolve_rules_config_path()),
-        loaded_rules=loaded_count,
+        loaded_rules=len(file_rules),
         replaced_existing=payload.replace_existing,
     )
 
@@ -970,14 +922,19 @@ def get_import(import_id: str, request: Request, db: Session = Depends(get_db))
 @app.get(f"{settings.api_prefix}/duplicate-reviews", response_model=list[DuplicateReviewResponse])
 def list_duplicate_reviews(
     request: Request,
+    response: Response,
     import_id: str | None = Query(default=None),
     status: str | None = Query(default=None),
     limit: int = Query(default=200, ge=1, le=2000),
+    # Only for offset paging; a cursor already marks the position, so the two
+    # together are rejected rather than skipping offset rows past it.
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None),
     db: Session = Depends(get_db),
 ) -> list[DuplicateReviewResponse]:
     user_id = _get_request_user_id(request)
-    query = db.query(DuplicateReview)
+    # Same as list_transactions: rows validate straight into the response model.
+    query = select(*DUPLICATE_REVIEW_RESPONSE_COLUMNS)
     query = _apply_user_scope(query, DuplicateReview, user_id)
     if import_id:
         query = query.filter(DuplicateReview.source_import_id == import_id)
@@ -987,14 +944,43 @@ def list_duplicate_reviews(
         except ValueError as exc:
             raise HTTPException(status_code=400, detail=str(exc)) from exc
         query = query.filter(DuplicateReview.status == normalized_status)
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail=CURSOR_WITH_OFFSET_MESSAGE)
+    if cursor:
+        # Seek past the last row of the previous page instead of counting an offset.
+        cursor_created_at, cursor_row_number, cursor_id = _decode_cursor(cursor, (datetime.fromisoformat, int, str))
+        query = query.filter(
+            or_(
+                DuplicateReview.created_at < cursor_created_at,
+                and_(
+                    DuplicateReview.created_at == cursor_created_at,
+                    tuple_(DuplicateReview.source_row_number, DuplicateReview.id)
+                    > tuple_(cursor_row_number, cursor_id),
+                ),
+            )
+        )
 
     rows = (
-        query.order_by(DuplicateReview.created_at.desc(), DuplicateReview.source_row_number.asc())
-        .offset(offset)
-        .limit(limit)
+        db.execute(
+            query.order_by(
+                DuplicateReview.created_at.desc(),
+                DuplicateReview.source_row_number.asc(),
+                DuplicateReview.id.asc(),
+            )
+            .offset(offset)
+            .limit(limit + 1)
+        )
+        .mappings()
         .all()
     )
-    return [_to_duplicate_review_response(row) for row in rows]
+    # The extra row only signals that another page exists; no COUNT(*) needed.
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = _encode_cursor(
+            [last["created_at"].isoformat(), last["source_row_number"], last["id"]]
+        )
+    return rows
 
 
 @app.patch(f"{settings.api_prefix}/duplicate-reviews/{{review_id}}", response_model=DuplicateReviewResponse)
@@ -1005,22 +991,25 @@ def update_duplicate_review(
     db: Session = Depends(get_db),
 ) -> DuplicateReviewResponse:
     user_id = _get_request_user_id(request)
-    row = (
-        _apply_user_scope(db.query(DuplicateReview), DuplicateReview, user_id)
-        .filter(DuplicateReview.id == review_id)
-        .one_or_none()
-    )
-    if row is None:
-        raise HTTPException(status_code=404, detail="Duplicate review not found")
-
     try:
-        row.status = _normalize_duplicate_review_status(payload.status)
+        status = _normalize_duplicate_review_status(payload.status)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
-    row.review_note = payload.review_note.strip() if payload.review_note else None
-    row.reviewed_at = datetime.now(UTC).replace(tzinfo=None)
+
+    # One UPDATE ... RETURNING instead of loading the row and flushing changes.
+    row = db.scalars(
+        update(DuplicateReview)
+        .where(DuplicateReview.id == review_id, _build_user_condition(DuplicateReview, user_id))
+        .values(
+            status=status,
+            review_note=payload.review_note.strip() if payload.review_note else None,
+            reviewed_at=utc_now_naive(),
+        )
+        .returning(DuplicateReview)
+    ).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Duplicate review not found")
     db.commit()
-    db.refresh(row)
     return _to_duplicate_review_response(row)
 
 
@@ -1052,6 +1041,8 @@ def resolve_duplicate_review(
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     db.commit()
+    if created_transaction_id:
+        analytics_cache.invalidate(user_id)
     return DuplicateReviewResolveResponse(
         action=action,
         status="created_transaction_and_deleted_review" if created_transaction_id else "deleted",
@@ -1090,30 +1081,38 @@ def bulk_resolve_duplicate_reviews(
         )
 
     action = payload.action.strip().lower()
+    # review_ids is already de-duplicated, so every id matches at most one row and
+    # the skip counts fall out of the result size; rows are applied in id order.
     rows = (
         _apply_user_scope(db.query(DuplicateReview), DuplicateReview, user_id)
         .filter(DuplicateReview.id.in_(review_ids))
+        .order_by(DuplicateReview.id)
         .all()
     )
-    row_by_id = {row.id: row for row in rows}
+    pending_rows = [row for row in rows if row.status == "pending"]
+    skipped_missing_count = requested_count - len(rows)
+    skipped_non_pending_count = len(rows) - len(pending_rows)
+
+    dedupe_fingerprints: dict[str, str] = {}
+    if action == "not_duplicate":
+        dedupe_fingerprints = _assign_dedupe_fingerprints(pending_rows, db)
+        # Loads the source imports into the identity map, so db.get() per row is free.
+        source_import_ids = {row.source_import_id for row in pending_rows}
+        if source_import_ids:
+            db.scalars(select(StatementImport).where(StatementImport.id.in_(source_import_ids))).all()
 
     processed_count = 0
     deleted_reviews_count = 0
     created_transactions_count = 0
-    skipped_missing_count = 0
-    skipped_non_pending_count = 0
-
-    for review_id in review_ids:
-        row = row_by_id.get(review_id)
-        if row is None:
-            skipped_missing_count += 1
-            continue
-        if row.status != "pending":
-            skipped_non_pending_count += 1
-            continue
 
+    for row in pending_rows:
         try:
-            created_transaction_id = _apply_duplicate_review_action(row=row, action=action, db=db)
+            created_transaction_id = _apply_duplicate_review_action(
+                row=row,
+                action=action,
+                db=db,
+                dedupe_fingerprint=dedupe_fingerprints.get(row.id),
+            )
         except ValueError as exc:
             raise HTTPException(status_code=400, detail=str(exc)) from exc
 
@@ -1124,6 +1123,8 @@ def bulk_resolve_duplicate_reviews(
 
     if processed_count > 0:
         db.commit()
+    if created_transactions_count > 0:
+        analytics_cache.invalidate(user_id)
 
     return DuplicateReviewBulkResolveResponse(
         action=action,
@@ -1139,15 +1140,21 @@ def bulk_resolve_duplicate_reviews(
 @app.get(f"{settings.api_prefix}/transactions", response_model=list[TransactionResponse])
 def list_transactions(
     request: Request,
+    response: Response,
     start_date: date | None = Query(default=None),
     end_date: date | None = Query(default=None),
     category: str | None = Query(default=None),
     limit: int = Query(default=100, ge=1, le=1000),
+    # Only for offset paging; a cursor already marks the position, so the two
+    # together are rejected rather than skipping offset rows past it.
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None),
     db: Session = Depends(get_db),
 ) -> list[TransactionResponse]:
     user_id = _get_request_user_id(request)
-    query = db.query(Transaction)
+    # Column mappings go straight to response_model validation, without ORM
+    # instances or intermediate TransactionResponse objects.
+    query = select(*TRANSACTION_RESPONSE_COLUMNS)
     query = _apply_user_scope(query, Transaction, user_id)
     if start_date is not None:
         query = query.filter(Transaction.transaction_date >= start_date)
@@ -1155,14 +1162,53 @@ def list_transactions(
         query = query.filter(Transaction.transaction_date <= end_date)
     if category:
         query = query.filter(Transaction.category == category)
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail=CURSOR_WITH_OFFSET_MESSAGE)
+    if cursor:
+        # Seek past the last row of the previous page instead of counting an offset.
+        # Undated rows sort first (the Postgres default for DESC), so a dated
+        # cursor has already passed all of them and a plain row comparison works.
+        cursor_date, cursor_created_at, cursor_id = _decode_cursor(
+            cursor, (_parse_optional_date, datetime.fromisoformat, str)
+        )
+        if cursor_date is None:
+            query = query.filter(
+                or_(
+                    Transaction.transaction_date.is_not(None),
+                    tuple_(Transaction.created_at, Transaction.id) < tuple_(cursor_created_at, cursor_id),
+                )
+            )
+        else:
+            query = query.filter(
+                tuple_(Transaction.transaction_date, Transaction.created_at, Transaction.id)
+                < tuple_(cursor_date, cursor_created_at, cursor_id)
+            )
 
     rows = (
-        query.order_by(Transaction.transaction_date.desc(), Transaction.created_at.desc())
-        .offset(offset)
-        .limit(limit)
+        db.execute(
+            query.order_by(
+                Transaction.transaction_date.desc().nulls_first(),
+                Transaction.created_at.desc(),
+                Transaction.id.desc(),
+            )
+            .offset(offset)
+            .limit(limit + 1)
+        )
+        .mappings()
         .all()
     )
-    return [_to_transaction_response(row) for row in rows]
+    # The extra row only signals that another page exists; no COUNT(*) needed.
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = _encode_cursor(
+            [
+                last["transaction_date"].isoformat() if last["transaction_date"] else None,
+                last["created_at"].isoformat(),
+                last["id"],
+            ]
+        )
+    return rows
 
 
 @app.post(
@@ -1179,52 +1225,74 @@ def recategorize_transactions(
     if not rules:
         raise HTTPException(status_code=400, detail="No active classification rules found.")
 
-    query = db.query(Transaction)
-    query = _apply_user_scope(query, Transaction, user_id)
+    conditions = [_build_user_condition(Transaction, user_id)]
     if payload.start_date is not None:
-        query = query.filter(Transaction.transaction_date >= payload.start_date)
+        conditions.append(Transaction.transaction_date >= payload.start_date)
     if payload.end_date is not None:
-        query = query.filter(Transaction.transaction_date <= payload.end_date)
+        conditions.append(Transaction.transaction_date <= payload.end_date)
     if payload.category:
-        query = query.filter(Transaction.category == payload.category)
+        conditions.append(Transaction.category == payload.category)
 
-    rows = query.all()
-    scanned_rows = len(rows)
-    updated_rows = 0
-    unchanged_rows = 0
     skipped_user_assigned_rows = 0
-
-    for row in rows:
-        if not payload.include_user_assigned and float(row.category_confidence) >= 1.0:
-            skipped_user_assigned_rows += 1
-            continue
-
-        new_category, new_confidence = classify_with_rules(
-            rules=rules,
-            description=row.description_raw,
-            merchant=row.merchant_normalized,
-            source_category="",
+    if not payload.include_user_assigned:
+        # User-assigned rows are only counted, never fetched.
+        skipped_user_assigned_rows = db.scalar(
+            select(func.count()).select_from(Transaction).where(*conditions, Transaction.category_confidence >= 1.0)
         )
-
-        # If no rule matched (fallback uncategorized), do not downgrade already-categorized rows.
-        if (
-            row.category != "uncategorized"
-            and new_category == "uncategorized"
-            and abs(float(new_confidence) - 0.5) < 1e-9
-        ):
-            unchanged_rows += 1
-            continue
-
-        if row.category == new_category and abs(float(row.category_confidence) - float(new_confidence)) < 1e-9:
-            unchanged_rows += 1
-            continue
-
-        row.category = new_category
-        row.category_confidence = float(new_confidence)
-        updated_rows += 1
-
-    if updated_rows > 0:
+        conditions.append(Transaction.category_confidence < 1.0)
+
+    # Column rows only, streamed and classified a batch at a time so memory stays
+    # flat; only the ids of changed rows are kept. Changes go back as one
+    # set-based UPDATE per new (category, confidence) pair.
+    result = db.execute(
+        select(
+            Transaction.id,
+            Transaction.description_raw,
+            Transaction.merchant_normalized,
+            Transaction.category,
+            Transaction.category_confidence,
+        )
+        .where(*conditions)
+        .execution_options(yield_per=RECATEGORIZE_BATCH_SIZE)
+    )
+    scanned_rows = skipped_user_assigned_rows
+    unchanged_rows = 0
+    updates: dict[tuple[str, float], list[str]] = {}
+    updated_rows = 0
+    for candidate_rows in result.partitions():
+        scanned_rows += len(candidate_rows)
+        classifications = classify_many(
+            rules,
+            ((row.description_raw, row.merchant_normalized, "") for row in candidate_rows),
+        )
+        for row, (new_category, new_confidence) in zip(candidate_rows, classifications):
+            # If no rule matched (fallback uncategorized), do not downgrade already-categorized rows.
+            if (
+                row.category != "uncategorized"
+                and new_category == "uncategorized"
+                and abs(float(new_confidence) - 0.5) < 1e-9
+            ):
+                unchanged_rows += 1
+                continue
+
+            if row.category == new_category and abs(float(row.category_confidence) - float(new_confidence)) < 1e-9:
+                unchanged_rows += 1
+                continue
+
+            updates.setdefault((new_category, float(new_confidence)), []).append(row.id)
+            updated_rows += 1
+
+    if updates:
+        for (new_category, new_confidence), ids in updates.items():
+            for start in range(0, len(ids), UPDATE_ID_CHUNK_SIZE):
+                db.execute(
+                    update(Transaction)
+                    .where(Transaction.id.in_(ids[start : start + UPDATE_ID_CHUNK_SIZE]))
+                    .values(category=new_category, category_confidence=new_confidence)
+                    .execution_options(synchronize_session=False)
+                )
         db.commit()
+        analytics_cache.invalidate(user_id)
 
     return RecategorizeTransactionsResponse(
         scanned_rows=scanned_rows,
@@ -1234,6 +1302,16 @@ def recategorize_transactions(
     )
 
 
+def _duplicate_transaction_error(existing_id: str | None) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=(
+            "Duplicate transaction exists with same date, merchant, amount, and direction. "
+            f"Existing transaction id: {existing_id}"
+        ),
+    )
+
+
 @app.post(f"{settings.api_prefix}/transactions", response_model=TransactionResponse)
 def create_manual_transaction(
     payload: ManualTransactionCreateRequest, request: Request, db: Session = Depends(get_db)
@@ -1253,42 +1331,31 @@ def create_manual_transaction(
     dedupe_fingerprint = build_dedupe_fingerprint(
         transaction_date=payload.transaction_date,
         merchant_name=merchant,
-        amount=payload.amount,
+        amount_cents=to_cents(payload.amount),
         direction=payload.direction,
-        user_scope=user_id or "",
+        user_scope=normalize_user_scope(user_id),
     )
+    # Fingerprint and natural-key duplicates in one query; the natural-key arm
+    # is narrowed by the (user_id, transaction_date, ...) index.
     existing = db.execute(
-        select(Transaction.id).where(
+        select(Transaction.id)
+        .where(
             _build_user_condition(Transaction, user_id),
-            Transaction.dedupe_fingerprint == dedupe_fingerprint,
-        )
-    ).scalar_one_or_none()
-    if existing is not None:
-        raise HTTPException(
-            status_code=409,
-            detail=(
-                "Duplicate transaction exists with same date, merchant, amount, and direction. "
-                f"Existing transaction id: {existing}"
+            or_(
+                Transaction.dedupe_fingerprint == dedupe_fingerprint,
+                and_(
+                    Transaction.transaction_date == payload.transaction_date,
+                    Transaction.merchant_key == merchant.lower(),
+                    Transaction.amount_cents == natural_key_cents(payload.amount),
+                    Transaction.direction == payload.direction,
+                ),
             ),
         )
-
-    natural_key_existing = db.execute(
-        select(Transaction.id).where(
-            _build_user_condition(Transaction, user_id),
-            Transaction.transaction_date == payload.transaction_date,
-            func.lower(Transaction.merchant_normalized) == merchant.lower(),
-            func.round(cast(Transaction.amount, Numeric(18, 2)), 2) == round(payload.amount, 2),
-            Transaction.direction == payload.direction,
-        )
+        .order_by((Transaction.dedupe_fingerprint == dedupe_fingerprint).desc())
+        .limit(1)
     ).scalar_one_or_none()
-    if natural_key_existing is not None:
-        raise HTTPException(
-            status_code=409,
-            detail=(
-                "Duplicate transaction exists with same date, merchant, amount, and direction. "
-                f"Existing transaction id: {natural_key_existing}"
-            ),
-        )
+    if existing is not None:
+        raise _duplicate_transaction_error(existing)
 
     txn = Transaction(
         user_id=user_id if settings.clerk_enabled else None,
@@ -1307,10 +1374,16 @@ def create_manual_transaction(
 
     manual_import.total_rows = (manual_import.total_rows or 0) + 1
     manual_import.processed_rows = (manual_import.processed_rows or 0) + 1
-    manual_import.finished_at = datetime.now(UTC).replace(tzinfo=None)
+    manual_import.finished_at = utc_now_naive()
 
-    db.commit()
-    db.refresh(txn)
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        # A concurrent request inserted the same fingerprint after the check above.
+        db.rollback()
+        existing = db.scalar(select(Transaction.id).where(Transaction.dedupe_fingerprint == dedupe_fingerprint))
+        raise _duplicate_transaction_error(existing) from exc
+    analytics_cache.invalidate(user_id)
     return _to_transaction_response(txn)
 
 
@@ -1319,42 +1392,63 @@ def update_transaction_category(
     transaction_id: str, payload: CategoryUpdateRequest, request: Request, db: Session = Depends(get_db)
 ) -> TransactionResponse:
     user_id = _get_request_user_id(request)
-    txn = (
-        _apply_user_scope(db.query(Transaction), Transaction, user_id)
-        .filter(Transaction.id == transaction_id)
-        .one_or_none()
-    )
-    if txn is None:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-
     try:
         normalized = _resolve_category(payload.category, db)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    txn.category = normalized
-    txn.category_confidence = 1.0
+    # One UPDATE ... RETURNING instead of loading the row and flushing changes.
+    txn = db.scalars(
+        update(Transaction)
+        .where(Transaction.id == transaction_id, _build_user_condition(Transaction, user_id))
+        .values(category=normalized, category_confidence=1.0)
+        .returning(Transaction)
+    ).one_or_none()
+    if txn is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
     db.commit()
-    db.refresh(txn)
+    analytics_cache.invalidate(user_id)
     return _to_transaction_response(txn)
 
 
+def _spend_totals_query(
+    group_column, user_id: str | None, start_date: date | None, end_date: date | None, limit: int | None
+):
+    # Both group columns are NOT NULL, so no COALESCE; the database sorts and
+    # truncates so only the returned groups are materialized.
+    total = func.sum(Transaction.amount)
+    query = select(group_column, total).where(
+        Transaction.direction == "debit", _build_user_condition(Transaction, user_id)
+    )
+    if start_date is not None:
+        query = query.where(Transaction.transaction_date >= start_date)
+    if end_date is not None:
+        query = query.where(Transaction.transaction_date <= end_date)
+    return query.group_by(group_column).order_by(total.desc(), group_column.asc()).limit(limit)
+
+
 @app.get(f"{settings.api_prefix}/analytics/categories", response_model=list[CategorySpend])
 def analytics_by_category(
     request: Request,
     start_date: date | None = Query(default=None),
     end_date: date | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=1000),
     db: Session = Depends(get_db),
 ) -> list[CategorySpend]:
     user_id = _get_request_user_id(request)
-    query = db.query(Transaction.category, func.sum(Transaction.amount)).filter(Transaction.direction == "debit")
-    query = query.filter(_build_user_condition(Transaction, user_id))
-    if start_date is not None:
-        query = query.filter(Transaction.transaction_date >= start_date)
-    if end_date is not None:
-        query = query.filter(Transaction.transaction_date <= end_date)
-    rows = query.group_by(Transaction.category).all()
-    return [CategorySpend(category=category or "uncategorized", total=float(total or 0.0)) for category, total in rows]
+    cache_entry = f"categories:{start_date}:{end_date}:{limit}"
+    cached = analytics_cache.get(user_id, cache_entry)
+    if cached is not None:
+        return [CategorySpend(category=category, total=total) for category, total in cached]
+
+    rows = [
+        (category, float(total))
+        for category, total in db.execute(
+            _spend_totals_query(Transaction.category, user_id, start_date, end_date, limit)
+        )
+    ]
+    analytics_cache.set(user_id, cache_entry, rows)
+    return [CategorySpend(category=category, total=total) for category, total in rows]
 
 
 @app.get(f"{settings.api_prefix}/analytics/merchants", response_model=list[MerchantSpend])
@@ -1362,49 +1456,68 @@ def analytics_by_merchant(
     request: Request,
     start_date: date | None = Query(default=None),
     end_date: date | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=1000),
     db: Session = Depends(get_db),
 ) -> list[MerchantSpend]:
     user_id = _get_request_user_id(request)
-    query = db.query(Transaction.merchant_normalized, func.sum(Transaction.amount)).filter(
-        Transaction.direction == "debit"
-    )
-    query = query.filter(_build_user_condition(Transaction, user_id))
-    if start_date is not None:
-        query = query.filter(Transaction.transaction_date >= start_date)
-    if end_date is not None:
-        query = query.filter(Transaction.transaction_date <= end_date)
-    rows = query.group_by(Transaction.merchant_normalized).all()
-    return [MerchantSpend(merchant=merchant or "unknown", total=float(total or 0.0)) for merchant, total in rows]
+    cache_entry = f"merchants:{start_date}:{end_date}:{limit}"
+    cached = analytics_cache.get(user_id, cache_entry)
+    if cached is not None:
+        return [MerchantSpend(merchant=merchant, total=total) for merchant, total in cached]
+
+    rows = [
+        (merchant, float(total))
+        for merchant, total in db.execute(
+            _spend_totals_query(Transaction.merchant_normalized, user_id, start_date, end_date, limit)
+        )
+    ]
+    analytics_cache.set(user_id, cache_entry, rows)
+    return [MerchantSpend(merchant=merchant, total=total) for merchant, total in rows]
+
+
+def _persist_insight_report(report: InsightReport) -> None:
+    db = SessionLocal()
+    try:
+        db.add(report)
+        db.commit()
+    except Exception:  # noqa: BLE001
+        logger.exception("insight_report_persist_failed", extra={"insight_id": report.id})
+    finally:
+        db.close()
 
 
 @app.post(f"{settings.api_prefix}/insights/generate", response_model=InsightReportResponse)
 def generate_insights(
-    payload: InsightGenerateRequest, request: Request, db: Session = Depends(get_db)
+    payload: InsightGenerateRequest,
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
 ) -> InsightReportResponse:
     user_id = _get_request_user_id(request)
-    query = db.query(Transaction)
-    query = _apply_user_scope(query, Transaction, user_id)
+    conditions = [_build_user_condition(Transaction, user_id)]
     if payload.start_date is not None:
-        query = query.filter(Transaction.transaction_date >= payload.start_date)
+        conditions.append(Transaction.transaction_date >= payload.start_date)
     if payload.end_date is not None:
-        query = query.filter(Transaction.transaction_date <= payload.end_date)
+        conditions.append(Transaction.transaction_date <= payload.end_date)
 
-    transactions = query.all()
-    if not transactions:
+    insight_payload = spend_insight_from_db(db, conditions)
+    if insight_payload is None:
         raise HTTPException(status_code=400, detail="No transactions found for selected range")
 
-    insight_payload = build_spend_insight(transactions)
-
     report = InsightReport(
+        id=new_id(),
         user_id=user_id if settings.clerk_enabled else None,
         start_date=payload.start_date,
         end_date=payload.end_date,
         summary=insight_payload["summary"],
-        payload_json=json.dumps(insight_payload),
+        payload_json=orjson.dumps(insight_payload).decode("utf-8"),
+        created_at=utc_now_naive(),
     )
-    db.add(report)
-    db.commit()
-    db.refresh(report)
+    # The caller already has the payload, so the insert runs after the response
+    # is sent; a GET for this id can briefly 404 until it lands.
+    background_tasks.add_task(_persist_insight_report, report)
+    response.headers["X-Report-Pending"] = "true"
 
     return InsightReportResponse(
         id=report.id,
@@ -1417,7 +1530,9 @@ def generate_insights(
 
 
 @app.get(f"{settings.api_prefix}/insights/{{insight_id}}", response_model=InsightReportResponse)
-def get_insight(insight_id: str, request: Request, db: Session = Depends(get_db)) -> InsightReportResponse:
+def get_insight(
+    insight_id: str, request: Request, response: Response, db: Session = Depends(get_db)
+) -> InsightReportResponse | Response:
     user_id = _get_request_user_id(request)
     report = (
         _apply_user_scope(db.query(InsightReport), InsightReport, user_id)
@@ -1427,22 +1542,27 @@ def get_insight(insight_id: str, request: Request, db: Session = Depends(get_db)
     if report is None:
         raise HTTPException(status_code=404, detail="Insight report not found")
 
+    # Reports are never modified after creation, so the id is a strong validator.
+    etag = f'"{report.id}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return InsightReportResponse(
         id=report.id,
         start_date=report.start_date,
         end_date=report.end_date,
         summary=report.summary,
-        payload=json.loads(report.payload_json),
+        payload=orjson.loads(report.payload_json),
         created_at=report.created_at,
     )
 
 
 @app.get(f"{settings.api_prefix}/ops/metrics")
-def get_ops_metrics(request: Request, db: Session = Depends(get_db)) -> dict:
+async def get_ops_metrics(request: Request, db: Session = Depends(get_db)) -> dict:
     if not settings.ops_metrics_enabled:
         raise HTTPException(status_code=404, detail="Ops metrics are disabled")
     _ = _get_request_user_id(request)
-    snapshot = _build_ops_snapshot(db)
+    snapshot = await _build_ops_snapshot(db)
     alerts = snapshot.get("alerts", [])
     if alerts:
         logger.warning(
@@ -1457,11 +1577,11 @@ def get_ops_metrics(request: Request, db: Session = Depends(get_db)) -> dict:
 
 
 @app.get(f"{settings.api_prefix}/ops/alerts")
-def get_ops_alerts(request: Request, db: Session = Depends(get_db)) -> dict:
+async def get_ops_alerts(request: Request, db: Session = Depends(get_db)) -> dict:
     if not settings.ops_metrics_enabled:
         raise HTTPException(status_code=404, detail="Ops metrics are disabled")
     _ = _get_request_user_id(request)
-    snapshot = _build_ops_snapshot(db)
+    snapshot = await _build_ops_snapshot(db)
     alerts = snapshot.get("alerts", [])
     return {
         "generated_at": snapshot["generated_at"],
@@ -0,0 +1,266 @@
+import logging
+import uuid
+
+import orjson
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .auth import ClerkTokenVerifier, extract_bearer_token
+from .config import cors_origins, settings
+from .observability import monotonic_ms
+from .rate_limit import RedisTokenBucketLimiter, pick_rate_limit_policy, resolve_rate_limit_identity
+
+logger = logging.getLogger("expense_tracker.api")
+
+RawHeaders = list[tuple[bytes, bytes]]
+
+
+# CORS settings are fixed for the life of the process.
+_CORS_ORIGINS = frozenset(cors_origins())
+_CORS_ALLOW_ALL = "*" in _CORS_ORIGINS
+_CORS_ALLOW_ANY_ORIGIN_HEADER = (b"access-control-allow-origin", b"*")
+_CORS_VARY_HEADER = (b"vary", b"Origin")
+_CORS_METHODS_HEADER = (b"access-control-allow-methods", b"*")
+_CORS_HEADERS_HEADER = (b"access-control-allow-headers", b"*")
+
+
+def _cors_headers(headers: Headers) -> RawHeaders:
+    # Responses produced by these middlewares never pass through CORSMiddleware,
+    # so they carry their own CORS headers.
+    if _CORS_ALLOW_ALL:
+        return [_CORS_ALLOW_ANY_ORIGIN_HEADER, _CORS_METHODS_HEADER, _CORS_HEADERS_HEADER]
+    origin = headers.get("origin", "").strip()
+    if origin and origin in _CORS_ORIGINS:
+        return [
+            (b"access-control-allow-origin", origin.encode("latin-1")),
+            _CORS_VARY_HEADER,
+            _CORS_METHODS_HEADER,
+            _CORS_HEADERS_HEADER,
+        ]
+    return [_CORS_METHODS_HEADER, _CORS_HEADERS_HEADER]
+
+
+# (policy name, capacity) -> pre-encoded X-RateLimit-Limit / X-RateLimit-Policy headers.
+_POLICY_HEADERS: dict[tuple[str, int], tuple[tuple[bytes, bytes], tuple[bytes, bytes]]] = {}
+
+
+def _rate_limit_headers(
+    limit: int,
+    remaining: float,
+    policy_name: str,
+    retry_after_seconds: int | None = None,
+) -> RawHeaders:
+    policy_headers = _POLICY_HEADERS.get((policy_name, limit))
+    if policy_headers is None:
+        policy_headers = (
+            (b"x-ratelimit-limit", b"%d" % limit),
+            (b"x-ratelimit-policy", policy_name.encode("latin-1")),
+        )
+        _POLICY_HEADERS[(policy_name, limit)] = policy_headers
+    # remaining is never negative, so int() is the floor.
+    raw: RawHeaders = [
+        policy_headers[0],
+        (b"x-ratelimit-remaining", b"%d" % max(0, int(remaining))),
+        policy_headers[1],
+    ]
+    if retry_after_seconds is not None:
+        raw.append((b"retry-after", b"%d" % max(1, retry_after_seconds)))
+    return raw
+
+
+async def _send_json(send: Send, status_code: int, content: dict, headers: RawHeaders) -> None:
+    # Same rendering as the app's ORJSONResponse, without building a Response object.
+    body = orjson.dumps(content)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"content-type", b"application/json"),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_api_error(
+    scope: Scope,
+    send: Send,
+    status_code: int,
+    content: dict,
+    headers: RawHeaders | None = None,
+) -> None:
+    raw = list(headers or [])
+    request_id = scope.get("state", {}).get("request_id")
+    if request_id:
+        raw.append((b"x-request-id", request_id.encode("latin-1")))
+    raw.extend(_cors_headers(Headers(scope=scope)))
+    await _send_json(send, status_code, content, raw)
+
+
+def _append_headers_on_start(send: Send, headers: RawHeaders) -> Send:
+    async def send_wrapper(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            message["headers"] = [*message.get("headers", ()), *headers]
+        await send(message)
+
+    return send_wrapper
+
+
+_API_PREFIX = settings.api_prefix
+
+
+def _is_api_request(scope: Scope) -> bool:
+    # ASGI methods are already uppercase and scope["path"] is a plain str.
+    return scope["method"] != "OPTIONS" and scope["path"].startswith(_API_PREFIX)
+
+
+class ObserveMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("x-request-id", "").strip() or str(uuid.uuid4())
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id
+        request_id_header = (b"x-request-id", request_id.encode("latin-1"))
+        status_code = 500
+        started_ms = monotonic_ms()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", ()), request_id_header]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:  # noqa: BLE001
+            duration_ms = round(monotonic_ms() - started_ms, 2)
+            logger.exception(
+                "request_unhandled_exception",
+                extra={
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "duration_ms": duration_ms,
+                },
+            )
+            raise
+
+        duration_ms = round(monotonic_ms() - started_ms, 2)
+        user_id = getattr(state.get("auth_context"), "user_id", None)
+        logger.info(
+            "request_complete",
+            extra={
+                "request_id": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status_code": status_code,
+                "duration_ms": duration_ms,
+                "user_id": user_id,
+            },
+        )
+
+
+class AuthMiddleware:
+    def __init__(self, app: ASGIApp, token_verifier: ClerkTokenVerifier | None) -> None:
+        self.app = app
+        self.token_verifier = token_verifier
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        state["auth_context"] = None
+        if not settings.clerk_enabled or not _is_api_request(scope):
+            await self.app(scope, receive, send)
+            return
+
+        token = extract_bearer_token(Headers(scope=scope).get("authorization"))
+        if not token:
+            if settings.clerk_require_auth:
+                await _send_api_error(scope, send, 401, {"detail": "Missing bearer token"})
+                return
+            await self.app(scope, receive, send)
+            return
+
+        if self.token_verifier is None:
+            await _send_api_error(scope, send, 503, {"detail": "Clerk is not configured"})
+            return
+        try:
+            context = self.token_verifier.cached(token)
+            if context is None:
+                # Signature checks and JWKS fetches block, so keep them off the event loop.
+                context = await run_in_threadpool(self.token_verifier.verify, token)
+            state["auth_context"] = context
+        except HTTPException as exc:
+            await _send_api_error(scope, send, exc.status_code, {"detail": str(exc.detail)})
+            return
+
+        await self.app(scope, receive, send)
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, rate_limiter: RedisTokenBucketLimiter) -> None:
+        self.app = app
+        self.rate_limiter = rate_limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.rate_limit_enabled or not _is_api_request(scope):
+            await self.app(scope, receive, send)
+            return
+
+        policy = pick_rate_limit_policy(scope["method"], scope["path"], settings)
+        identity = resolve_rate_limit_identity(HTTPConnection(scope))
+        decision = self.rate_limiter.consume(policy=policy, identity=identity)
+
+        if decision.error and not settings.rate_limit_fail_open:
+            await _send_api_error(
+                scope,
+                send,
+                503,
+                {"detail": "Rate limiter unavailable. Try again shortly."},
+            )
+            return
+
+        if not decision.allowed:
+            retry_after_seconds = max(1, -(-decision.retry_after_ms // 1000))
+            await _send_json(
+                send,
+                429,
+                {
+                    "detail": "Rate limit exceeded",
+                    "policy": policy.name,
+                    "retry_after_seconds": retry_after_seconds,
+                },
+                _rate_limit_headers(
+                    limit=policy.capacity,
+                    remaining=decision.remaining_tokens,
+                    policy_name=policy.name,
+                    retry_after_seconds=retry_after_seconds,
+                )
+                + _cors_headers(Headers(scope=scope)),
+            )
+            return
+
+        headers = _rate_limit_headers(
+            limit=policy.capacity,
+            remaining=decision.remaining_tokens,
+            policy_name=policy.name,
+        )
+        if decision.error and settings.rate_limit_fail_open:
+            headers.append((b"x-ratelimit-bypass", b"redis_unavailable"))
+        await self.app(scope, receive, _append_headers_on_start(send, headers))
@@ -1,16 +1,17 @@
-import uuid
 from datetime import date, datetime
 
-from sqlalchemy import Date, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .db import Base
+from .dedupe import natural_key_cents
+from .ids import new_id
 
 
 class StatementImport(Base):
     __tablename__ = "statement_imports"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
     user_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
     status: Mapped[str] = mapped_column(String(32), default="queued", nullable=False)
@@ -25,21 +26,24 @@ class StatementImport(Base):
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
     )
 
+    __table_args__ = (Index("ix_statement_imports_user_status", "user_id", "status"),)
+
 
 class UploadedFile(Base):
     __tablename__ = "uploaded_files"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
     import_id: Mapped[str] = mapped_column(String(36), ForeignKey("statement_imports.id"), unique=True, nullable=False)
     original_filename: Mapped[str] = mapped_column(String(255), nullable=False)
-    content_text: Mapped[str] = mapped_column(Text, nullable=False)
+    # The raw CSV can be large; it is only loaded when explicitly asked for.
+    content_text: Mapped[str] = mapped_column(Text, nullable=False, deferred=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
 
 class Category(Base):
     __tablename__ = "categories"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
     name: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
@@ -47,7 +51,7 @@ class Category(Base):
 class ClassificationRule(Base):
     __tablename__ = "classification_rules"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
     rule_type: Mapped[str] = mapped_column(String(64), nullable=False)
     pattern: Mapped[str] = mapped_column(String(255), nullable=False)
     category: Mapped[str] = mapped_column(String(64), nullable=False)
@@ -60,16 +64,29 @@ class ClassificationRule(Base):
     )
 
 
+def _merchant_key_default(context) -> str:
+    return (context.get_current_parameters().get("merchant_normalized") or "unknown").lower()
+
+
+def _amount_cents_default(context) -> int:
+    return natural_key_cents(context.get_current_parameters()["amount"])
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
     user_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
     source_import_id: Mapped[str] = mapped_column(String(36), ForeignKey("statement_imports.id"), nullable=False)
     transaction_date: Mapped[date | None] = mapped_column(Date, nullable=True)
     description_raw: Mapped[str] = mapped_column(Text, nullable=False, default="")
     merchant_normalized: Mapped[str] = mapped_column(String(255), nullable=False, default="unknown")
+    # Lowercased merchant_normalized, so natural-key lookups compare a plain indexed column.
+    merchant_key: Mapped[str] = mapped_column(String(255), nullable=False, default=_merchant_key_default)
     amount: Mapped[float] = mapped_column(Float, nullable=False)
+    # Amount in whole cents for natural-key matching: integer equality instead of
+    # a per-row numeric cast and round. Amounts are never edited after insert.
+    amount_cents: Mapped[int] = mapped_column(BigInteger, nullable=False, default=_amount_cents_default)
     currency: Mapped[str] = mapped_column(String(8), default="USD", nullable=False)
     direction: Mapped[str] = mapped_column(String(16), default="debit", nullable=False)
     category: Mapped[str] = mapped_column(String(64), default="uncategorized", nullable=False)
@@ -77,11 +94,31 @@ class Transaction(Base):
     dedupe_fingerprint: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        Index("ix_transactions_user_date_created", "user_id", "transaction_date", "created_at", "id"),
+        Index("ix_transactions_user_category", "user_id", "category"),
+        Index("ix_transactions_user_merchant_key", "user_id", "merchant_key", "transaction_date"),
+        # Covering indexes: spend-by-category/merchant aggregates read only the index.
+        Index(
+            "ix_transactions_spend_category", "user_id", "direction", "transaction_date", "category", "amount"
+        ),
+        Index(
+            "ix_transactions_spend_merchant",
+            "user_id",
+            "direction",
+            "transaction_date",
+            "merchant_normalized",
+            "amount",
+        ),
+        # Postgres does not index foreign keys on its own.
+        Index("ix_transactions_source_import", "source_import_id"),
+    )
+
 
 class DuplicateReview(Base):
     __tablename__ = "duplicate_reviews"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
     user_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
     source_import_id: Mapped[str] = mapped_column(String(36), ForeignKey("statement_imports.id"), nullable=False)
     source_row_number: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -102,14 +139,26 @@ class DuplicateReview(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     reviewed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("ix_duplicate_reviews_user_created", "user_id", "created_at"),
+        Index("ix_duplicate_reviews_import_created", "source_import_id", "created_at"),
+    )
+
 
 class InsightReport(Base):
     __tablename__ = "insight_reports"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
     user_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
     start_date: Mapped[date | None] = mapped_column(Date, nullable=True)
     end_date: Mapped[date | None] = mapped_column(Date, nullable=True)
     summary: Mapped[str] = mapped_column(Text, nullable=False)
     payload_json: Mapped[str] = mapped_column(Text, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    applied_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,18 +1,49 @@
-import json
 import logging
 import os
 import sys
 import time
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 from typing import Any
 
+import orjson
+
 from .config import settings
 
 
+# LogRecord attributes that are not user-supplied `extra` fields.
+_RESERVED_RECORD_KEYS = frozenset(
+    {
+        "name",
+        "msg",
+        "args",
+        "levelname",
+        "levelno",
+        "pathname",
+        "filename",
+        "module",
+        "exc_info",
+        "exc_text",
+        "stack_info",
+        "lineno",
+        "funcName",
+        "created",
+        "msecs",
+        "relativeCreated",
+        "thread",
+        "threadName",
+        "processName",
+        "process",
+        "message",
+        "asctime",
+    }
+)
+
+
 class JsonFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         payload: dict[str, Any] = {
-            "ts": datetime.now(UTC).isoformat(),
+            # The record already carries its creation time; no second clock read.
+            "ts": datetime.fromtimestamp(record.created, UTC).isoformat(),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -20,35 +51,11 @@ class JsonFormatter(logging.Formatter):
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
 
-        reserved = {
-            "name",
-            "msg",
-            "args",
-            "levelname",
-            "levelno",
-            "pathname",
-            "filename",
-            "module",
-            "exc_info",
-            "exc_text",
-            "stack_info",
-            "lineno",
-            "funcName",
-            "created",
-            "msecs",
-            "relativeCreated",
-            "thread",
-            "threadName",
-            "processName",
-            "process",
-            "message",
-            "asctime",
-        }
         for key, value in record.__dict__.items():
-            if key in reserved or key.startswith("_"):
+            if key in _RESERVED_RECORD_KEYS or key.startswith("_"):
                 continue
             payload[key] = value
-        return json.dumps(payload, default=str)
+        return orjson.dumps(payload, default=str).decode("utf-8")
 
 
 def configure_logging(service_name: str) -> None:
@@ -110,9 +117,18 @@ def init_sentry(service_name: str) -> None:
     )
 
 
+_UTC_EPOCH_NAIVE = datetime(1970, 1, 1)
+
+
 def utc_now_iso() -> str:
     return datetime.now(UTC).isoformat()
 
 
+def utc_now_naive() -> datetime:
+    # Naive UTC for the DateTime columns; skips building an aware datetime
+    # only to strip it with replace(tzinfo=None).
+    return _UTC_EPOCH_NAIVE + timedelta(microseconds=time.time_ns() // 1000)
+
+
 def monotonic_ms() -> float:
     return time.perf_counter() * 1000.0
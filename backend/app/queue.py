@@ -1,23 +1,44 @@
+import re
+import threading
+import time
 from dataclasses import dataclass
+from itertools import islice
 
-from redis import Redis
 from rq import Queue
-from rq.exceptions import NoSuchJobError
 from rq.job import Job
 from rq.registry import DeferredJobRegistry, FailedJobRegistry, FinishedJobRegistry, ScheduledJobRegistry, StartedJobRegistry
-from rq.worker import Worker
+from rq.utils import as_text, current_timestamp
+from rq.worker_registration import REDIS_WORKER_KEYS
 
 from .config import settings
+from .redis_client import get_redis
 from .tasks import process_import_job
 
 
-@dataclass
+ERROR_LINE_RE = re.compile(
+    r"sqlalchemy\.exc\.|psycopg\.errors\.|^(?:IntegrityError|OperationalError|ProgrammingError|ValueError|KeyError)"
+)
+
+# Polled import status reads share job states for a couple of seconds instead
+# of each going back to Redis.
+JOB_STATE_CACHE_SECONDS = 2.0
+JOB_STATE_CACHE_SIZE = 1024
+# Ops snapshots share one registry scrape for a few seconds; concurrent callers
+# wait for the scrape in flight instead of starting their own.
+QUEUE_METRICS_CACHE_SECONDS = 5.0
+# After a failed enqueue, imports run inline for a few seconds without retrying
+# Redis, so a missing local Redis costs one connection attempt, not one per upload.
+REDIS_RETRY_SECONDS = 5.0
+_redis_unavailable_until = 0.0
+
+
+@dataclass(frozen=True, slots=True)
 class QueueJobState:
     status: str
     error: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class QueueMetrics:
     queue_name: str
     queued: int
@@ -30,66 +51,117 @@ class QueueMetrics:
     workers_busy: int
 
 
-def enqueue_import(import_id: str) -> str | None:
-    try:
-        redis_connection = Redis.from_url(settings.redis_url)
-        redis_connection.ping()
-        queue = Queue("imports", connection=redis_connection)
-        job = queue.enqueue(process_import_job, import_id, job_timeout=600)
-        return job.id
-    except Exception:  # noqa: BLE001
-        # Fallback makes local development possible without Redis.
-        process_import_job(import_id)
-        return None
+def enqueue_import(import_id: str, job_id: str | None = None) -> str | None:
+    global _redis_unavailable_until
+    if time.monotonic() >= _redis_unavailable_until:
+        try:
+            redis_connection = get_redis(settings.redis_url)
+            queue = Queue("imports", connection=redis_connection)
+            job = queue.enqueue(process_import_job, import_id, job_id=job_id, job_timeout=600)
+            return job.id
+        except Exception:  # noqa: BLE001
+            _redis_unavailable_until = time.monotonic() + REDIS_RETRY_SECONDS
+    # Fallback makes local development possible without Redis.
+    process_import_job(import_id)
+    return None
 
 
 def read_job_state(job_id: str) -> QueueJobState | None:
+    states = read_job_states([job_id])
+    if states is None:
+        return None
+    return states[job_id]
+
+
+_job_state_cache: dict[str, tuple[QueueJobState, float]] = {}
+_job_state_cache_lock = threading.Lock()
+
+
+def read_job_states(job_ids: list[str]) -> dict[str, QueueJobState] | None:
+    now = time.monotonic()
+    states: dict[str, QueueJobState] = {}
+    with _job_state_cache_lock:
+        for job_id in job_ids:
+            cached = _job_state_cache.get(job_id)
+            if cached is not None and cached[1] > now:
+                states[job_id] = cached[0]
+    misses = [job_id for job_id in job_ids if job_id not in states]
+    if not misses:
+        return states
     try:
-        redis_connection = Redis.from_url(settings.redis_url)
-        redis_connection.ping()
-        job = Job.fetch(job_id, connection=redis_connection)
-        status = job.get_status(refresh=True)
-        error = None
-        if status == "failed" and job.exc_info:
-            error = _summarize_exception(job.exc_info)
-        return QueueJobState(status=status, error=error)
-    except NoSuchJobError:
-        return QueueJobState(status="missing", error="Queue job not found")
+        redis_connection = get_redis(settings.redis_url)
+        # fetch_many loads every job hash in one pipelined round trip, and the
+        # status comes from that hash rather than a per-job refresh.
+        jobs = Job.fetch_many(misses, connection=redis_connection)
+        fetched = [(job_id, _job_state(job)) for job_id, job in zip(misses, jobs)]
     except Exception:  # noqa: BLE001
         return None
+    expires_at = now + JOB_STATE_CACHE_SECONDS
+    with _job_state_cache_lock:
+        for job_id, state in fetched:
+            states[job_id] = state
+            if len(_job_state_cache) >= JOB_STATE_CACHE_SIZE:
+                _job_state_cache.pop(next(iter(_job_state_cache)))
+            _job_state_cache[job_id] = (state, expires_at)
+    return states
+
+
+def _job_state(job: Job | None) -> QueueJobState:
+    if job is None:
+        return QueueJobState(status="missing", error="Queue job not found")
+    status = job.get_status(refresh=False)
+    error = None
+    if status == "failed" and job.exc_info:
+        error = _summarize_exception(job.exc_info)
+    return QueueJobState(status=status, error=error)
+
+
+_queue_metrics_cache: dict[str, tuple[QueueMetrics | None, float]] = {}
+_queue_metrics_lock = threading.Lock()
 
 
 def read_queue_metrics(queue_name: str = "imports") -> QueueMetrics | None:
+    with _queue_metrics_lock:
+        cached = _queue_metrics_cache.get(queue_name)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        # An unavailable Redis is cached too, so callers do not each wait out a timeout.
+        metrics = _scrape_queue_metrics(queue_name)
+        _queue_metrics_cache[queue_name] = (metrics, time.monotonic() + QUEUE_METRICS_CACHE_SECONDS)
+        return metrics
+
+
+def _scrape_queue_metrics(queue_name: str) -> QueueMetrics | None:
     try:
-        redis_connection = Redis.from_url(settings.redis_url)
-        redis_connection.ping()
-        queue = Queue(queue_name, connection=redis_connection)
-        started = StartedJobRegistry(queue_name, connection=redis_connection)
-        deferred = DeferredJobRegistry(queue_name, connection=redis_connection)
-        scheduled = ScheduledJobRegistry(queue_name, connection=redis_connection)
-        failed = FailedJobRegistry(queue_name, connection=redis_connection)
-        finished = FinishedJobRegistry(queue_name, connection=redis_connection)
-        workers = Worker.all(connection=redis_connection)
-        workers_busy = 0
-        for worker in workers:
-            state = None
-            try:
-                state = worker.get_state()
-            except Exception:  # noqa: BLE001
-                state = getattr(worker, "state", None)
-            if state == "busy":
-                workers_busy += 1
+        redis_connection = get_redis(settings.redis_url)
+        # Registry counts go out in one pipeline. Counting only unexpired entries
+        # gives the same numbers as registry.count without its cleanup writes,
+        # which the workers' own maintenance already performs.
+        live = f"({current_timestamp()}"
+        with redis_connection.pipeline(transaction=False) as pipeline:
+            pipeline.llen(Queue(queue_name, connection=redis_connection).key)
+            for registry_class in (StartedJobRegistry, DeferredJobRegistry, FailedJobRegistry, FinishedJobRegistry):
+                pipeline.zcount(registry_class(queue_name, connection=redis_connection).key, live, "+inf")
+            pipeline.zcard(ScheduledJobRegistry(queue_name, connection=redis_connection).key)
+            pipeline.smembers(REDIS_WORKER_KEYS)
+            queued, started, deferred, failed, finished, scheduled, worker_keys = pipeline.execute()
+
+        # One more round trip for every worker's state instead of loading each worker.
+        with redis_connection.pipeline(transaction=False) as pipeline:
+            for worker_key in worker_keys:
+                pipeline.hget(worker_key, "state")
+            worker_states = [as_text(state) for state in pipeline.execute() if state is not None]
 
         return QueueMetrics(
             queue_name=queue_name,
-            queued=len(queue),
-            started=_registry_size(started),
-            deferred=_registry_size(deferred),
-            scheduled=_registry_size(scheduled),
-            failed=_registry_size(failed),
-            finished=_registry_size(finished),
-            workers_total=len(workers),
-            workers_busy=workers_busy,
+            queued=queued,
+            started=started,
+            deferred=deferred,
+            scheduled=scheduled,
+            failed=failed,
+            finished=finished,
+            workers_total=len(worker_states),
+            workers_busy=worker_states.count("busy"),
         )
     except Exception:  # noqa: BLE001
         return None
@@ -100,45 +172,13 @@ def _summarize_exception(exc_info: str) -> str:
     if not lines:
         return "Queue job failed."
 
-    error_lines = [
-        line
-        for line in lines
-        if (
-            "sqlalchemy.exc." in line
-            or "psycopg.errors." in line
-            or line.startswith("IntegrityError")
-            or line.startswith("OperationalError")
-            or line.startswith("ProgrammingError")
-            or line.startswith("ValueError")
-            or line.startswith("KeyError")
-        )
-    ]
+    # Only the first two matching lines are used, so stop scanning once found.
+    error_lines = list(islice(filter(ERROR_LINE_RE.search, lines), 2))
     if error_lines:
-        return " | ".join(error_lines[:2])[:1000]
+        return " | ".join(error_lines)[:1000]
 
     # Fallback to last non-background line.
     for line in reversed(lines):
         if "Background on this error" not in line:
             return line[:1000]
     return lines[-1][:1000]
-
-
-def _registry_size(registry) -> int:
-    count_attr = getattr(registry, "count", None)
-    if isinstance(count_attr, int):
-        return count_attr
-    if callable(count_attr):
-        try:
-            value = count_attr()
-            if isinstance(value, int):
-                return value
-        except Exception:  # noqa: BLE001
-            pass
-    try:
-        return len(registry)
-    except Exception:  # noqa: BLE001
-        pass
-    try:
-        return len(registry.get_job_ids())
-    except Exception:  # noqa: BLE001
-        return 0
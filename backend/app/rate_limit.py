@@ -1,20 +1,25 @@
 import math
 import re
-import time
 from dataclasses import dataclass
+from functools import lru_cache
 
-from fastapi import Request
 from redis import Redis
+from redis.commands.core import Script
+from starlette.requests import HTTPConnection
 
-from .config import Settings
+from .config import RuntimeSettings
+from .redis_client import get_redis
 
 TOKEN_BUCKET_LUA = """
 local key = KEYS[1]
-local now_ms = tonumber(ARGV[1])
-local capacity = tonumber(ARGV[2])
-local refill_per_sec = tonumber(ARGV[3])
-local requested = tonumber(ARGV[4])
-local ttl_seconds = tonumber(ARGV[5])
+local capacity = tonumber(ARGV[1])
+local refill_per_sec = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local ttl_seconds = tonumber(ARGV[4])
+
+-- Use the Redis clock so API workers with skewed clocks share one timeline.
+local now = redis.call("TIME")
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
 
 local data = redis.call("HMGET", key, "tokens", "ts")
 local tokens = tonumber(data[1])
@@ -48,14 +53,20 @@ else
   end
 end
 
-redis.call("HMSET", key, "tokens", tokens, "ts", now_ms)
-redis.call("EXPIRE", key, ttl_seconds)
+redis.call("HSET", key, "tokens", tokens, "ts", now_ms)
+-- ttl_seconds is at least twice the time to refill an empty bucket, so the key
+-- only needs re-arming once half of it has run down; a new key reports -1.
+if redis.call("TTL", key) < ttl_seconds / 2 then
+  redis.call("EXPIRE", key, ttl_seconds)
+end
 
 return {allowed, tokens, retry_after_ms}
 """
 
+KEY_PART_UNSAFE_RE = re.compile(r"[^a-zA-Z0-9:._-]+")
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class RateLimitPolicy:
     name: str
     capacity: int
@@ -70,7 +81,7 @@ class RateLimitPolicy:
         return int(max(60, math.ceil(drain_seconds * 2)))
 
 
-@dataclass
+@dataclass(slots=True)
 class RateLimitDecision:
     allowed: bool
     remaining_tokens: float
@@ -98,26 +109,32 @@ class RedisTokenBucketLimiter:
         self.redis_url = redis_url
         self.key_prefix = key_prefix
         self._client: Redis | None = None
+        self._script: Script | None = None
 
     @property
     def client(self) -> Redis:
         if self._client is None:
-            self._client = Redis.from_url(self.redis_url)
+            self._client = get_redis(self.redis_url)
         return self._client
 
+    @property
+    def script(self) -> Script:
+        # Runs via EVALSHA; redis-py reloads the script if the server lost it.
+        if self._script is None:
+            self._script = self.client.register_script(TOKEN_BUCKET_LUA)
+        return self._script
+
     def consume(self, policy: RateLimitPolicy, identity: str) -> RateLimitDecision:
         key = f"{self.key_prefix}:{policy.name}:{identity}"
-        now_ms = int(time.time() * 1000)
         try:
-            raw = self.client.eval(
-                TOKEN_BUCKET_LUA,
-                1,
-                key,
-                now_ms,
-                policy.capacity,
-                policy.refill_per_sec,
-                policy.requested_tokens,
-                policy.ttl_seconds,
+            raw = self.script(
+                keys=[key],
+                args=[
+                    policy.capacity,
+                    policy.refill_per_sec,
+                    policy.requested_tokens,
+                    policy.ttl_seconds,
+                ],
             )
             allowed = _to_int(raw[0], 0) == 1 if isinstance(raw, list) else True
             remaining = _to_float(raw[1], 0.0) if isinstance(raw, list) else 0.0
@@ -138,20 +155,27 @@ class RedisTokenBucketLimiter:
             )
 
 
+@lru_cache(maxsize=16)
 def _policy_from_per_minute(name: str, per_minute: int) -> RateLimitPolicy:
     safe = max(1, int(per_minute))
     refill_per_sec = safe / 60.0
     return RateLimitPolicy(name=name, capacity=safe, refill_per_sec=refill_per_sec)
 
 
-def pick_rate_limit_policy(method: str, path: str, settings: Settings) -> RateLimitPolicy:
+@lru_cache(maxsize=4)
+def _strict_routes(api_prefix: str) -> frozenset[tuple[str, str]]:
+    return frozenset(
+        {
+            ("POST", f"{api_prefix}/imports"),
+            ("POST", f"{api_prefix}/transactions/recategorize"),
+            ("POST", f"{api_prefix}/duplicate-reviews/bulk-resolve"),
+        }
+    )
+
+
+def pick_rate_limit_policy(method: str, path: str, settings: RuntimeSettings) -> RateLimitPolicy:
     normalized_method = method.upper()
-    strict_routes = {
-        ("POST", f"{settings.api_prefix}/imports"),
-        ("POST", f"{settings.api_prefix}/transactions/recategorize"),
-        ("POST", f"{settings.api_prefix}/duplicate-reviews/bulk-resolve"),
-    }
-    if (normalized_method, path) in strict_routes:
+    if (normalized_method, path) in _strict_routes(settings.api_prefix):
         return _policy_from_per_minute("strict", settings.rate_limit_strict_per_minute)
     if normalized_method in {"GET", "HEAD"}:
         return _policy_from_per_minute("read", settings.rate_limit_read_per_minute)
@@ -159,11 +183,11 @@ def pick_rate_limit_policy(method: str, path: str, settings: Settings) -> RateLi
 
 
 def _normalize_key_part(raw: str, max_len: int = 128) -> str:
-    cleaned = re.sub(r"[^a-zA-Z0-9:._-]+", "_", raw.strip())
+    cleaned = KEY_PART_UNSAFE_RE.sub("_", raw.strip())
     return (cleaned[:max_len] or "unknown").lower()
 
 
-def resolve_rate_limit_identity(request: Request) -> str:
+def resolve_rate_limit_identity(request: HTTPConnection) -> str:
     user_id = request.headers.get("x-user-id", "").strip()
     if user_id:
         return f"user:{_normalize_key_part(user_id)}"
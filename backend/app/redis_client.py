@@ -0,0 +1,10 @@
+from functools import lru_cache
+
+from redis import Redis
+
+
+@lru_cache(maxsize=None)
+def get_redis(redis_url: str) -> Redis:
+    # One client, and so one connection pool, per URL for the whole process;
+    # Redis.from_url on every call would open a fresh connection each time.
+    return Redis.from_url(redis_url)
@@ -1,10 +1,14 @@
-import json
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
+import orjson
+
 from .config import settings
 
 
+# Settings are fixed for the life of the process, so the path is resolved once.
+@lru_cache(maxsize=1)
 def resolve_rules_config_path() -> Path:
     configured = Path(settings.rules_config_path)
     if configured.is_absolute():
@@ -34,8 +38,7 @@ def load_rules_config_file() -> list[dict[str, Any]]:
     if not path.exists():
         return []
 
-    with path.open("r", encoding="utf-8") as handle:
-        parsed = json.load(handle)
+    parsed = orjson.loads(path.read_bytes())
     if not isinstance(parsed, list):
         raise ValueError("Rules config file must contain a JSON array")
 
@@ -51,23 +54,14 @@ def load_rules_config_file() -> list[dict[str, Any]]:
 
 
 def save_rules_config_file(rules: list[dict[str, Any]]) -> Path:
-    normalized = [_normalize_rule_entry(item) for item in rules]
+    # _normalize_rule_entry already returns the file's entry shape, in key order.
     output = [
-        {
-            "rule_type": row["rule_type"],
-            "pattern": row["pattern"],
-            "category": row["category"],
-            "confidence": row["confidence"],
-            "priority": row["priority"],
-            "is_active": row["is_active"],
-        }
-        for row in normalized
+        row
+        for row in map(_normalize_rule_entry, rules)
         if row["rule_type"] and row["pattern"] and row["category"]
     ]
 
     path = resolve_rules_config_path()
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as handle:
-        json.dump(output, handle, indent=2)
-        handle.write("\n")
+    path.write_bytes(orjson.dumps(output, option=orjson.OPT_INDENT_2) + b"\n")
     return path
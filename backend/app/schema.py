@@ -1,19 +1,136 @@
-from sqlalchemy import inspect, text
+import hashlib
 
-from .db import engine
+from sqlalchemy import bindparam, delete, func, insert, inspect, select, text, update
+
+from .db import Base, engine
+from .dedupe import build_dedupe_fingerprint, normalize_merchant_name, normalize_user_scope, to_cents
+from .models import DuplicateReview, SchemaVersion, Transaction
+
+# Bump whenever a model or ensure_schema_compatibility changes, otherwise
+# databases already at this version never see the change.
+SCHEMA_VERSION = 2
+# Hex length of the SHA-256 fingerprints written before the switch to BLAKE2b-128.
+LEGACY_FINGERPRINT_LENGTH = 64
+FINGERPRINT_BACKFILL_BATCH_SIZE = 1000
+
+
+def _applied_schema_version() -> int | None:
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(func.max(SchemaVersion.version))).scalar()
+    except Exception:  # noqa: BLE001
+        return None
+
+
+def _legacy_fingerprint(row) -> str:
+    date_part = row.transaction_date.isoformat() if row.transaction_date else ""
+    raw = (
+        f"{normalize_user_scope(row.user_id)}|{date_part}|{normalize_merchant_name(row.merchant_normalized)}"
+        f"|{abs(row.amount):.2f}|{row.direction.strip().lower()}"
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _fallback_fingerprint(legacy_fingerprint: str) -> str:
+    return hashlib.blake2b(legacy_fingerprint.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _rehash_legacy_fingerprints(model, unique: bool) -> None:
+    # Keys that still match their row's fields get the row's BLAKE2b fingerprint,
+    # so re-imports keep matching on it. The rest (approved-review fallbacks) only
+    # have to stay unique and get a digest of the old key. Batches walk the
+    # primary key and commit separately, so an interrupted run resumes.
+    last_id = ""
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(
+                    model.id,
+                    model.user_id,
+                    model.transaction_date,
+                    model.merchant_normalized,
+                    model.amount,
+                    model.direction,
+                    model.dedupe_fingerprint,
+                )
+                .where(
+                    model.id > last_id,
+                    func.length(model.dedupe_fingerprint) == LEGACY_FINGERPRINT_LENGTH,
+                )
+                .order_by(model.id)
+                .limit(FINGERPRINT_BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                return
+            fingerprints: dict[str, str] = {}
+            for row in rows:
+                if row.dedupe_fingerprint == _legacy_fingerprint(row):
+                    fingerprints[row.id] = build_dedupe_fingerprint(
+                        transaction_date=row.transaction_date,
+                        merchant_name=row.merchant_normalized,
+                        amount_cents=to_cents(row.amount),
+                        direction=row.direction.strip().lower(),
+                        user_scope=normalize_user_scope(row.user_id),
+                    )
+                else:
+                    fingerprints[row.id] = _fallback_fingerprint(row.dedupe_fingerprint)
+            if unique:
+                # A duplicate approved since the upgrade may already hold the new key.
+                taken = set(
+                    connection.execute(
+                        select(model.dedupe_fingerprint).where(
+                            model.dedupe_fingerprint.in_(list(fingerprints.values()))
+                        )
+                    ).scalars()
+                )
+                for row in rows:
+                    if fingerprints[row.id] in taken:
+                        fingerprints[row.id] = _fallback_fingerprint(row.dedupe_fingerprint)
+            connection.execute(
+                update(model)
+                .where(model.id == bindparam("row_id"))
+                .values(dedupe_fingerprint=bindparam("fingerprint")),
+                [{"row_id": row_id, "fingerprint": fingerprint} for row_id, fingerprint in fingerprints.items()],
+            )
+            last_id = rows[-1].id
+
+
+def ensure_schema() -> None:
+    # One query on a current database instead of create_all plus the column and
+    # index inspection on every process start.
+    if _applied_schema_version() == SCHEMA_VERSION:
+        return
+    Base.metadata.create_all(bind=engine)
+    ensure_schema_compatibility()
+    _rehash_legacy_fingerprints(Transaction, unique=True)
+    _rehash_legacy_fingerprints(DuplicateReview, unique=False)
+    with engine.begin() as connection:
+        connection.execute(delete(SchemaVersion))
+        connection.execute(insert(SchemaVersion).values(version=SCHEMA_VERSION))
 
 
 def ensure_schema_compatibility() -> None:
     inspector = inspect(engine)
+    missing_columns: dict[str, list[str]] = {}
     ddl: list[str] = []
 
-    def add_if_missing(table_name: str, column_name: str, column_ddl: str) -> None:
+    def add_if_missing(table_name: str, column_name: str, column_ddl: str) -> bool:
         try:
             columns = {column["name"] for column in inspector.get_columns(table_name)}
+        except Exception:  # noqa: BLE001
+            return False
+        if column_name in columns:
+            return False
+        missing_columns.setdefault(table_name, []).append(f"ADD COLUMN {column_name} {column_ddl}")
+        return True
+
+    def add_index_if_missing(table_name: str, index_name: str, columns: str) -> None:
+        try:
+            indexes = {index["name"] for index in inspector.get_indexes(table_name)}
         except Exception:  # noqa: BLE001
             return
-        if column_name not in columns:
-            ddl.append(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_ddl}")
+        if index_name not in indexes:
+            ddl.append(f"CREATE INDEX {index_name} ON {table_name} ({columns})")
 
     add_if_missing("statement_imports", "queue_job_id", "VARCHAR(64)")
     add_if_missing("statement_imports", "processing_started_at", "TIMESTAMP")
@@ -22,8 +139,48 @@ def ensure_schema_compatibility() -> None:
     add_if_missing("transactions", "user_id", "VARCHAR(128)")
     add_if_missing("insight_reports", "user_id", "VARCHAR(128)")
     add_if_missing("duplicate_reviews", "user_id", "VARCHAR(128)")
+    if add_if_missing("transactions", "merchant_key", "VARCHAR(255)"):
+        ddl.append("UPDATE transactions SET merchant_key = lower(merchant_normalized)")
+    if add_if_missing("transactions", "amount_cents", "BIGINT"):
+        # The database's own rounding, so stored keys match what the old
+        # round(cast(amount as numeric(18, 2)), 2) comparison saw.
+        ddl.append(
+            "UPDATE transactions SET amount_cents = "
+            "CAST(ROUND(ROUND(CAST(amount AS NUMERIC(18, 2)), 2) * 100) AS BIGINT)"
+        )
+
+    add_index_if_missing(
+        "transactions", "ix_transactions_user_date_created", "user_id, transaction_date, created_at, id"
+    )
+    add_index_if_missing("transactions", "ix_transactions_user_category", "user_id, category")
+    add_index_if_missing(
+        "transactions", "ix_transactions_user_merchant_key", "user_id, merchant_key, transaction_date"
+    )
+    add_index_if_missing(
+        "transactions", "ix_transactions_spend_category", "user_id, direction, transaction_date, category, amount"
+    )
+    add_index_if_missing(
+        "transactions",
+        "ix_transactions_spend_merchant",
+        "user_id, direction, transaction_date, merchant_normalized, amount",
+    )
+    add_index_if_missing("transactions", "ix_transactions_source_import", "source_import_id")
+    add_index_if_missing("duplicate_reviews", "ix_duplicate_reviews_user_created", "user_id, created_at")
+    add_index_if_missing(
+        "duplicate_reviews", "ix_duplicate_reviews_import_created", "source_import_id, created_at"
+    )
+    add_index_if_missing("statement_imports", "ix_statement_imports_user_status", "user_id, status")
+
+    # Postgres takes every new column for a table in one ALTER TABLE (one lock);
+    # SQLite only accepts a single ADD COLUMN per statement.
+    alter: list[str] = []
+    for table_name, additions in missing_columns.items():
+        if engine.dialect.name == "sqlite":
+            alter.extend(f"ALTER TABLE {table_name} {addition}" for addition in additions)
+        else:
+            alter.append(f"ALTER TABLE {table_name} {', '.join(additions)}")
 
-    if ddl:
+    if alter or ddl:
         with engine.begin() as connection:
-            for statement in ddl:
+            for statement in alter + ddl:
                 connection.execute(text(statement))
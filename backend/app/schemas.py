@@ -1,10 +1,12 @@
 from datetime import date, datetime
 from typing import Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class StatementImportResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     filename: str
     status: str
@@ -19,6 +21,8 @@ class StatementImportResponse(BaseModel):
 
 
 class TransactionResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     source_import_id: str
     transaction_date: date | None
@@ -83,6 +87,8 @@ class ClassificationRuleUpdateRequest(BaseModel):
 
 
 class ClassificationRuleResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     rule_type: str
     pattern: str
@@ -110,6 +116,8 @@ class ClassificationRuleConfigLoadResponse(BaseModel):
 
 
 class CategoryResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     name: str
     created_at: datetime
@@ -140,6 +148,8 @@ class InsightReportResponse(BaseModel):
 
 
 class DuplicateReviewResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     source_import_id: str
     source_row_number: int
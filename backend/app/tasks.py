@@ -2,30 +2,74 @@ import csv
 import io
 import logging
 from datetime import date, datetime
+from functools import lru_cache
 
 from dateutil import parser as date_parser
-from sqlalchemy import Numeric, cast, func, select
+from sqlalchemy import insert, or_, select, update
 
-from .classification_engine import classify_with_rules, load_active_rules
-from .db import SessionLocal
-from .dedupe import build_dedupe_fingerprint
+from .analytics_cache import AnalyticsCache
+from .classification_engine import classify_many, load_active_rules
+from .config import settings
+from .db import SessionLocal, engine, insert_ignoring_conflicts
+from .dedupe import build_dedupe_fingerprint, natural_key_cents, normalize_user_scope, to_cents
 from .models import DuplicateReview, StatementImport, Transaction, UploadedFile
+from .observability import utc_now_naive
 
 logger = logging.getLogger("expense_tracker.worker.imports")
+analytics_cache = AnalyticsCache(settings.redis_url, ttl_seconds=settings.analytics_cache_ttl_seconds)
+FINGERPRINT_LOOKUP_CHUNK_SIZE = 1000
+INSERT_BATCH_SIZE = 1000
+NATURAL_KEY_PREFETCH_BATCH_SIZE = 1000
+# strptime fast paths that read the same as dateutil with dayfirst=False. Two-digit
+# years are left to dateutil, whose century window differs from strptime's %y.
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%Y/%m/%d")
+_last_date_format = DATE_FORMATS[0]
 
 
-def _pick_value(row: dict[str, str], candidates: list[str]) -> str:
-    lowered = {k.strip().lower(): v for k, v in row.items() if k is not None}
-    for candidate in candidates:
-        value = lowered.get(candidate)
+# Header names (stripped, lowercased) tried in order for each field.
+COLUMN_CANDIDATES = {
+    "date": ("date", "transaction date", "posted date", "posting date"),
+    "description": ("description", "memo", "merchant", "name", "details"),
+    "source_category": ("category", "type", "transaction type"),
+    "amount": ("amount", "transaction amount"),
+    "debit": ("debit", "withdrawal"),
+    "credit": ("credit", "deposit"),
+}
+
+
+def _resolve_columns(header: list[str]) -> dict[str, tuple[int, ...]]:
+    # Resolved once per file, with csv.DictReader's precedence for repeated names:
+    # a raw name keeps its last column, then later-seen names win after lowercasing.
+    raw_positions = {name: index for index, name in enumerate(header)}
+    positions = {name.strip().lower(): index for name, index in raw_positions.items()}
+    return {
+        field: tuple(positions[name] for name in candidates if name in positions)
+        for field, candidates in COLUMN_CANDIDATES.items()
+    }
+
+
+def _pick_value(row: list[str], indexes: tuple[int, ...]) -> str:
+    for index in indexes:
+        value = row[index] if index < len(row) else None
         if value:
             return value.strip()
     return ""
 
 
+# Statements repeat the same few dozen dates, and date objects are immutable.
+@lru_cache(maxsize=4096)
 def _parse_date(value: str) -> date | None:
+    global _last_date_format
     if not value:
         return None
+    # A statement uses one date format throughout, so the last match is tried first.
+    for date_format in (_last_date_format, *DATE_FORMATS):
+        try:
+            parsed = datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+        _last_date_format = date_format
+        return parsed
     try:
         return date_parser.parse(value, dayfirst=False).date()
     except (ValueError, TypeError, OverflowError):
@@ -35,6 +79,13 @@ def _parse_date(value: str) -> date | None:
 def _parse_amount(value: str) -> float | None:
     if not value:
         return None
+    # Plain numbers (the usual export format) need no cleanup; float() already
+    # ignores surrounding whitespace. Anything it rejects takes the full path.
+    if "$" not in value and "," not in value and value[-1] != ")":
+        try:
+            return float(value)
+        except ValueError:
+            pass
     cleaned = value.replace("$", "").replace(",", "").strip()
     if cleaned.startswith("(") and cleaned.endswith(")"):
         cleaned = f"-{cleaned[1:-1]}"
@@ -45,19 +96,25 @@ def _parse_amount(value: str) -> float | None:
 
 
 def _merchant_from_description(description: str) -> str:
-    cleaned = " ".join(description.split()).strip()
+    cleaned = " ".join(description.split())
     if not cleaned:
         return "unknown"
     return cleaned[:100]
 
 
-def _parse_row(row: dict[str, str], classification_rules, user_scope: str) -> dict | None:
-    date_str = _pick_value(row, ["date", "transaction date", "posted date", "posting date"])
-    description = _pick_value(row, ["description", "memo", "merchant", "name", "details"])
-    source_category = _pick_value(row, ["category", "type", "transaction type"])
-    amount_raw = _pick_value(row, ["amount", "transaction amount"])
-    debit_raw = _pick_value(row, ["debit", "withdrawal"])
-    credit_raw = _pick_value(row, ["credit", "deposit"])
+def _parse_row(
+    row: list[str],
+    columns: dict[str, tuple[int, ...]],
+    user_scope: str,
+) -> tuple[dict, tuple[str, str, str]] | None:
+    # Returns the parsed row and its (description, merchant, source_category)
+    # classification input; categories are filled in for the whole file at once.
+    date_str = _pick_value(row, columns["date"])
+    description = _pick_value(row, columns["description"])
+    source_category = _pick_value(row, columns["source_category"])
+    amount_raw = _pick_value(row, columns["amount"])
+    debit_raw = _pick_value(row, columns["debit"])
+    credit_raw = _pick_value(row, columns["credit"])
 
     txn_date = _parse_date(date_str)
     direction = "debit"
@@ -89,35 +146,32 @@ def _parse_row(row: dict[str, str], classification_rules, user_scope: str) -> di
             direction = "credit"
 
     merchant = _merchant_from_description(description)
-    category, confidence = classify_with_rules(
-        rules=classification_rules,
-        description=description,
-        merchant=merchant,
-        source_category=source_category,
-    )
     fingerprint = build_dedupe_fingerprint(
         transaction_date=txn_date,
         merchant_name=merchant,
-        amount=amount,
+        amount_cents=to_cents(amount),
         direction=direction,
         user_scope=user_scope,
     )
 
-    return {
+    parsed = {
         "transaction_date": txn_date,
         "description_raw": description or "unknown transaction",
         "merchant_normalized": merchant,
+        # Natural-key columns, set here so the duplicate check and the insert
+        # share them instead of the column defaults recomputing them.
+        "merchant_key": merchant.lower(),
         "amount": amount,
+        "amount_cents": natural_key_cents(amount),
         "currency": "USD",
         "direction": direction,
-        "category": category,
-        "category_confidence": confidence,
         "dedupe_fingerprint": fingerprint,
     }
+    return parsed, (description, merchant, source_category)
 
 
 def _queue_duplicate_review(
-    session,
+    duplicate_reviews: list[dict],
     import_id: str,
     source_row_number: int,
     duplicate_scope: str,
@@ -126,30 +180,148 @@ def _queue_duplicate_review(
     user_id: str | None = None,
     matched_transaction_id: str | None = None,
 ) -> None:
-    session.add(
-        DuplicateReview(
-            user_id=user_id,
-            source_import_id=import_id,
-            source_row_number=source_row_number,
-            duplicate_scope=duplicate_scope,
-            duplicate_reason=duplicate_reason,
-            matched_transaction_id=matched_transaction_id,
-            transaction_date=parsed_row["transaction_date"],
-            description_raw=parsed_row["description_raw"],
-            merchant_normalized=parsed_row["merchant_normalized"],
-            amount=parsed_row["amount"],
-            currency=parsed_row["currency"],
-            direction=parsed_row["direction"],
-            category=parsed_row["category"],
-            category_confidence=parsed_row["category_confidence"],
-            dedupe_fingerprint=parsed_row["dedupe_fingerprint"],
-            status="pending",
+    duplicate_reviews.append(
+        {
+            "user_id": user_id,
+            "source_import_id": import_id,
+            "source_row_number": source_row_number,
+            "duplicate_scope": duplicate_scope,
+            "duplicate_reason": duplicate_reason,
+            "matched_transaction_id": matched_transaction_id,
+            "transaction_date": parsed_row["transaction_date"],
+            "description_raw": parsed_row["description_raw"],
+            "merchant_normalized": parsed_row["merchant_normalized"],
+            "amount": parsed_row["amount"],
+            "currency": parsed_row["currency"],
+            "direction": parsed_row["direction"],
+            "category": parsed_row["category"],
+            "category_confidence": parsed_row["category_confidence"],
+            "dedupe_fingerprint": parsed_row["dedupe_fingerprint"],
+            "status": "pending",
+        }
+    )
+
+
+def _insert_duplicate_reviews(session, duplicate_reviews: list[dict]) -> None:
+    # One multi-row INSERT per batch instead of an ORM object per duplicate.
+    if duplicate_reviews:
+        session.execute(insert(DuplicateReview), duplicate_reviews)
+        duplicate_reviews.clear()
+
+
+def _existing_fingerprint_ids(session, user_condition, fingerprints: set[str]) -> dict[str, str]:
+    # One IN query per chunk instead of one lookup per CSV row.
+    pending = list(fingerprints)
+    existing: dict[str, str] = {}
+    for start in range(0, len(pending), FINGERPRINT_LOOKUP_CHUNK_SIZE):
+        chunk = pending[start : start + FINGERPRINT_LOOKUP_CHUNK_SIZE]
+        existing.update(
+            session.execute(
+                select(Transaction.dedupe_fingerprint, Transaction.id).where(
+                    user_condition,
+                    Transaction.dedupe_fingerprint.in_(chunk),
+                )
+            ).all()
+        )
+    return existing
+
+
+def _existing_natural_key_ids(session, user_condition, parsed_rows: list[tuple[int, dict]]) -> dict[tuple, str]:
+    # Every natural-key match shares a transaction date with some imported row,
+    # so only the file's date range (plus undated rows, if any) is read.
+    dates = [parsed["transaction_date"] for _, parsed in parsed_rows]
+    known_dates = [value for value in dates if value is not None]
+    date_conditions = []
+    if known_dates:
+        date_conditions.append(Transaction.transaction_date.between(min(known_dates), max(known_dates)))
+    if len(known_dates) < len(dates):
+        date_conditions.append(Transaction.transaction_date.is_(None))
+    if not date_conditions:
+        return {}
+
+    result = session.execute(
+        select(
+            Transaction.id,
+            Transaction.transaction_date,
+            Transaction.merchant_key,
+            Transaction.amount_cents,
+            Transaction.direction,
         )
+        .where(user_condition, or_(*date_conditions))
+        .execution_options(yield_per=NATURAL_KEY_PREFETCH_BATCH_SIZE)
     )
+    existing: dict[tuple, str] = {}
+    for transaction_id, transaction_date, merchant_key, amount_cents, direction in result:
+        existing.setdefault((transaction_date, merchant_key, amount_cents, direction), transaction_id)
+    return existing
+
+
+def _insert_transactions(
+    session,
+    import_id: str,
+    user_id: str | None,
+    user_condition,
+    pending: list[tuple[int, dict]],
+    duplicate_reviews: list[dict],
+) -> int:
+    # One executemany per batch instead of a unit-of-work flush per Transaction.
+    # render_nulls keeps undated rows in the same batch as dated ones.
+    if not pending:
+        return 0
+    statement = (
+        insert_ignoring_conflicts(session, Transaction, ["dedupe_fingerprint"])
+        .returning(Transaction.dedupe_fingerprint)
+        .execution_options(render_nulls=True)
+    )
+    inserted = set(
+        session.scalars(
+            statement,
+            [{"user_id": user_id, "source_import_id": import_id, **parsed} for _, parsed in pending],
+        )
+    )
+    conflicts = [(row_number, parsed) for row_number, parsed in pending if parsed["dedupe_fingerprint"] not in inserted]
+    if conflicts:
+        # Another import or a manual entry added these fingerprints after the
+        # up-front lookup; they become reviews instead of failing the import.
+        matched_ids = _existing_fingerprint_ids(
+            session,
+            user_condition,
+            {parsed["dedupe_fingerprint"] for _, parsed in conflicts},
+        )
+        for row_number, parsed in conflicts:
+            _queue_duplicate_review(
+                duplicate_reviews=duplicate_reviews,
+                import_id=import_id,
+                source_row_number=row_number,
+                duplicate_scope="existing_data",
+                duplicate_reason="fingerprint_match",
+                parsed_row=parsed,
+                user_id=user_id,
+                matched_transaction_id=matched_ids.get(parsed["dedupe_fingerprint"]),
+            )
+    return len(pending) - len(conflicts)
+
+
+def _report_progress(import_id: str, total_rows: int, processed_rows: int) -> None:
+    # The import's rows commit once, at the end, so progress goes out in its own
+    # short transaction. SQLite has a single writer and the import already holds
+    # it, so there progress only appears when the import finishes.
+    if engine.dialect.name == "sqlite":
+        return
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                update(StatementImport)
+                .where(StatementImport.id == import_id)
+                .values(total_rows=total_rows, processed_rows=processed_rows)
+            )
+    except Exception:  # noqa: BLE001
+        logger.warning("import_progress_update_failed", extra={"import_id": import_id})
 
 
 def process_import_job(import_id: str) -> None:
     session = SessionLocal()
+    record: StatementImport | None = None
     try:
         record = session.get(StatementImport, import_id)
         if record is None:
@@ -165,124 +337,128 @@ def process_import_job(import_id: str) -> None:
 
         record.status = "processing"
         record.error_message = None
-        record.processing_started_at = datetime.utcnow()
+        record.processing_started_at = utc_now_naive()
         record.finished_at = None
         session.commit()
 
-        uploaded_file = session.execute(
-            select(UploadedFile).where(UploadedFile.import_id == import_id)
+        content = session.execute(
+            select(UploadedFile.content_text).where(UploadedFile.import_id == import_id)
         ).scalar_one_or_none()
-        if uploaded_file is None:
+        if content is None:
             raise ValueError("Uploaded CSV content not found for import")
+        # StringIO keeps a 4-byte-per-character copy of the text; UTF-8 bytes
+        # decoded chunk by chunk during the scan are about a quarter of that.
+        # Rebinding drops the str itself.
+        content = content.encode("utf-8")
 
         total_rows = 0
         processed_rows = 0
         seen_fingerprints: set[str] = set()
         classification_rules = load_active_rules(session)
-        user_scope = (record.user_id or "").strip()
+        user_scope = normalize_user_scope(record.user_id)
         user_condition = (
             Transaction.user_id.is_(None)
             if record.user_id is None
             else Transaction.user_id == record.user_id
         )
 
-        with io.StringIO(uploaded_file.content_text) as handle:
-            reader = csv.DictReader(handle)
+        parsed_rows: list[tuple[int, dict]] = []
+        classification_inputs: list[tuple[str, str, str]] = []
+        # newline="\n" splits lines exactly as StringIO did.
+        with io.TextIOWrapper(io.BytesIO(content), encoding="utf-8", newline="\n") as handle:
+            reader = csv.reader(handle)
+            columns = _resolve_columns(next(reader, []))
             for row in reader:
-                total_rows += 1
-                parsed = _parse_row(
-                    row=row,
-                    classification_rules=classification_rules,
-                    user_scope=user_scope,
-                )
-                if parsed is None:
-                    continue
-                if parsed["dedupe_fingerprint"] in seen_fingerprints:
-                    _queue_duplicate_review(
-                        session=session,
-                        import_id=import_id,
-                        source_row_number=total_rows,
-                        duplicate_scope="same_import",
-                        duplicate_reason="fingerprint_match",
-                        parsed_row=parsed,
-                        user_id=record.user_id,
-                        matched_transaction_id=None,
-                    )
+                # Blank lines are not rows, as with csv.DictReader.
+                if not row:
                     continue
+                total_rows += 1
+                result = _parse_row(row=row, columns=columns, user_scope=user_scope)
+                if result is not None:
+                    parsed_rows.append((total_rows, result[0]))
+                    classification_inputs.append(result[1])
 
-                exists_stmt = select(Transaction.id).where(
-                    user_condition,
-                    Transaction.dedupe_fingerprint == parsed["dedupe_fingerprint"]
-                )
-                matched_existing_id = session.execute(exists_stmt).scalar_one_or_none()
-                if matched_existing_id is not None:
-                    _queue_duplicate_review(
-                        session=session,
-                        import_id=import_id,
-                        source_row_number=total_rows,
-                        duplicate_scope="existing_data",
-                        duplicate_reason="fingerprint_match",
-                        parsed_row=parsed,
-                        user_id=record.user_id,
-                        matched_transaction_id=matched_existing_id,
-                    )
-                    continue
+        # One automaton pass per rule type for the whole file, not one per row.
+        categories = classify_many(classification_rules, classification_inputs)
+        for (_, parsed), (category, confidence) in zip(parsed_rows, categories):
+            parsed["category"] = category
+            parsed["category_confidence"] = confidence
 
-                date_condition = (
-                    Transaction.transaction_date.is_(None)
-                    if parsed["transaction_date"] is None
-                    else Transaction.transaction_date == parsed["transaction_date"]
+        existing_ids = _existing_fingerprint_ids(
+            session,
+            user_condition,
+            {parsed["dedupe_fingerprint"] for _, parsed in parsed_rows},
+        )
+        natural_key_ids = _existing_natural_key_ids(session, user_condition, parsed_rows)
+        pending_transactions: list[tuple[int, dict]] = []
+        duplicate_reviews: list[dict] = []
+        for row_number, parsed in parsed_rows:
+            if parsed["dedupe_fingerprint"] in seen_fingerprints:
+                _queue_duplicate_review(
+                    duplicate_reviews=duplicate_reviews,
+                    import_id=import_id,
+                    source_row_number=row_number,
+                    duplicate_scope="same_import",
+                    duplicate_reason="fingerprint_match",
+                    parsed_row=parsed,
+                    user_id=record.user_id,
+                    matched_transaction_id=None,
                 )
-                natural_key_exists_stmt = select(Transaction.id).where(
-                    user_condition,
-                    date_condition,
-                    func.lower(Transaction.merchant_normalized)
-                    == parsed["merchant_normalized"].strip().lower(),
-                    func.round(cast(Transaction.amount, Numeric(18, 2)), 2)
-                    == round(float(parsed["amount"]), 2),
-                    Transaction.direction == parsed["direction"],
+                continue
+
+            matched_existing_id = existing_ids.get(parsed["dedupe_fingerprint"])
+            if matched_existing_id is not None:
+                _queue_duplicate_review(
+                    duplicate_reviews=duplicate_reviews,
+                    import_id=import_id,
+                    source_row_number=row_number,
+                    duplicate_scope="existing_data",
+                    duplicate_reason="fingerprint_match",
+                    parsed_row=parsed,
+                    user_id=record.user_id,
+                    matched_transaction_id=matched_existing_id,
                 )
-                matched_natural_key_id = session.execute(natural_key_exists_stmt).scalar_one_or_none()
-                if matched_natural_key_id is not None:
-                    _queue_duplicate_review(
-                        session=session,
-                        import_id=import_id,
-                        source_row_number=total_rows,
-                        duplicate_scope="existing_data",
-                        duplicate_reason="natural_key_match",
-                        parsed_row=parsed,
-                        user_id=record.user_id,
-                        matched_transaction_id=matched_natural_key_id,
-                    )
-                    continue
+                continue
 
-                txn = Transaction(
+            matched_natural_key_id = natural_key_ids.get(
+                (parsed["transaction_date"], parsed["merchant_key"], parsed["amount_cents"], parsed["direction"])
+            )
+            if matched_natural_key_id is not None:
+                _queue_duplicate_review(
+                    duplicate_reviews=duplicate_reviews,
+                    import_id=import_id,
+                    source_row_number=row_number,
+                    duplicate_scope="existing_data",
+                    duplicate_reason="natural_key_match",
+                    parsed_row=parsed,
                     user_id=record.user_id,
-                    source_import_id=import_id,
-                    transaction_date=parsed["transaction_date"],
-                    description_raw=parsed["description_raw"],
-                    merchant_normalized=parsed["merchant_normalized"],
-                    amount=parsed["amount"],
-                    currency=parsed["currency"],
-                    direction=parsed["direction"],
-                    category=parsed["category"],
-                    category_confidence=parsed["category_confidence"],
-                    dedupe_fingerprint=parsed["dedupe_fingerprint"],
+                    matched_transaction_id=matched_natural_key_id,
                 )
-                session.add(txn)
-                seen_fingerprints.add(parsed["dedupe_fingerprint"])
-                processed_rows += 1
+                continue
 
-                if total_rows % 100 == 0:
-                    record.total_rows = total_rows
-                    record.processed_rows = processed_rows
-                    session.commit()
+            pending_transactions.append((row_number, parsed))
+            seen_fingerprints.add(parsed["dedupe_fingerprint"])
 
+            if len(pending_transactions) >= INSERT_BATCH_SIZE:
+                processed_rows += _insert_transactions(
+                    session, import_id, record.user_id, user_condition, pending_transactions, duplicate_reviews
+                )
+                pending_transactions.clear()
+                # Write the batch's reviews too, but keep one transaction so a
+                # failed import leaves nothing behind.
+                _insert_duplicate_reviews(session, duplicate_reviews)
+                _report_progress(import_id, total_rows, processed_rows)
+
+        processed_rows += _insert_transactions(
+            session, import_id, record.user_id, user_condition, pending_transactions, duplicate_reviews
+        )
+        _insert_duplicate_reviews(session, duplicate_reviews)
         record.status = "completed"
         record.total_rows = total_rows
         record.processed_rows = processed_rows
-        record.finished_at = datetime.utcnow()
+        record.finished_at = utc_now_naive()
         session.commit()
+        analytics_cache.invalidate(record.user_id)
         logger.info(
             "import_job_completed",
             extra={
@@ -301,12 +477,15 @@ def process_import_job(import_id: str) -> None:
             },
         )
         # Roll back first so session can safely query/update the import record.
+        # The record loaded above stays in the session, so it is only fetched
+        # again if the failure came before it was loaded.
         session.rollback()
         try:
-            record = session.get(StatementImport, import_id)
+            if record is None:
+                record = session.get(StatementImport, import_id)
             if record is not None:
                 record.status = "failed"
-                record.finished_at = datetime.utcnow()
+                record.finished_at = utc_now_naive()
                 record.error_message = f"{exc.__class__.__name__}: {exc}"
                 session.commit()
         except Exception:  # noqa: BLE001
@@ -2,11 +2,12 @@ import logging
 
 from redis import Redis
 from rq import Worker
+from rq.worker_pool import WorkerPool
 
 from app.config import settings
-from app.db import Base, engine
+from app.db import engine
 from app.observability import configure_logging, init_sentry
-from app.schema import ensure_schema_compatibility
+from app.schema import ensure_schema
 
 
 def main() -> None:
@@ -14,19 +15,27 @@ def main() -> None:
     init_sentry("expense_tracker.worker")
     logger = logging.getLogger("expense_tracker.worker")
 
-    Base.metadata.create_all(bind=engine)
-    ensure_schema_compatibility()
+    ensure_schema()
 
+    worker_count = settings.import_worker_count
     logger.info(
         "worker_starting",
         extra={
             "app_env": settings.app_env,
             "redis_url_present": bool(settings.redis_url),
+            "worker_count": worker_count,
         },
     )
     redis_connection = Redis.from_url(settings.redis_url)
-    worker = Worker(["imports"], connection=redis_connection)
-    worker.work(with_scheduler=False)
+    if worker_count == 1:
+        worker = Worker(["imports"], connection=redis_connection)
+        worker.work(with_scheduler=False)
+        return
+
+    # Pool workers are forked; drop the connections opened by the schema checks
+    # so no child inherits a socket another process is using.
+    engine.dispose()
+    WorkerPool(["imports"], connection=redis_connection, num_workers=worker_count).start()
 
 
 if __name__ == "__main__":